@@ -0,0 +1,118 @@
+import copy
+import json
+from typing import Dict
+import xxhash
+from grafana_client import GrafanaClient
+
+# Keys Grafana assigns to receiver integrations on its own; they never come from
+# the CSV/JSON inputs, so they are ignored when comparing receivers.
+SERVER_ASSIGNED_RECEIVER_KEYS = ["uid", "provenance"]
+
+
+def _normalize(obj):
+    # Grafana omits empty and false values when it returns the config, while
+    # the templates render them explicitly. Drop them on both sides so that
+    # equal configs hash equally.
+    if isinstance(obj, dict):
+        normalized = {k: _normalize(v) for k, v in obj.items()}
+        return {k: v for k, v in normalized.items()
+                if not (v is None or v is False or (isinstance(v, (str, list, dict)) and not v))}
+    if isinstance(obj, list):
+        return [_normalize(v) for v in obj]
+    return obj
+
+
+def _hash(obj) -> str:
+    data = json.dumps(_normalize(obj), sort_keys=True, separators=(",", ":"))
+    return xxhash.xxh64(data.encode('utf-8')).hexdigest()
+
+
+def _receiver_config(config: Dict) -> Dict:
+    # Grafana never returns secrets: a fetched integration only lists the names
+    # of its secret settings in secureFields. A rendered one carries the values
+    # in secureSettings, which cannot be compared against the fetched config,
+    # so they are hashed as well and such a receiver always counts as changed.
+    secure_keys = {k for k, v in (config.get("secureFields") or {}).items() if v}
+    secure_settings = config.get("secureSettings") or {}
+    secure_keys.update(secure_settings.keys())
+    config = {k: v for k, v in config.items()
+              if k not in SERVER_ASSIGNED_RECEIVER_KEYS + ["secureFields", "secureSettings"]}
+    config["secure_keys"] = sorted(secure_keys)
+    config["secure_settings"] = secure_settings
+    return config
+
+
+def hash_receiver(receiver: Dict) -> str:
+    receiver = dict(receiver)
+    receiver["grafana_managed_receiver_configs"] = [
+        _receiver_config(c) for c in receiver.get("grafana_managed_receiver_configs", [])
+    ]
+    return _hash(receiver)
+
+
+def hash_route(route: Dict) -> str:
+    return _hash(route)
+
+
+def config_digest(config: Dict) -> Dict:
+    am_config = config.get("alertmanager_config", {})
+    others = {k: v for k, v in am_config.items() if k not in ["receivers", "route"]}
+    return {
+        "receivers": {r.get("name"): hash_receiver(r) for r in am_config.get("receivers", [])},
+        "route": hash_route(am_config.get("route", {})),
+        "others": _hash(others),
+    }
+
+
+class AlertmanagerConfigUpdate:
+    """Alertmanager config fetched once per run and written back only if it changed.
+
+    Contact points and notification policies are both applied to `config`, so a
+    run that updates both issues a single write. Every write makes Grafana reload
+    its notifier, so commit() compares digests of the receivers and routes
+    against the fetched config and skips the write when they are identical.
+    Grafana never returns secrets, so a receiver that sets secret settings
+    (e.g. a Slack webhook URL) is always written.
+    """
+
+    def __init__(self, g: GrafanaClient) -> None:
+        self._g = g
+        config, success = g.get_alertmanager_config()
+        if not success:
+            raise RuntimeError("failed to get alertmanager config")
+        self._original_digest = config_digest(config)
+        self.config = copy.deepcopy(config)
+
+    def changes(self) -> Dict:
+        before = self._original_digest
+        after = config_digest(self.config)
+        added = [n for n in after["receivers"] if n not in before["receivers"]]
+        removed = [n for n in before["receivers"] if n not in after["receivers"]]
+        updated = [n for n, h in after["receivers"].items()
+                   if n in before["receivers"] and before["receivers"][n] != h]
+        return {
+            "receivers_added": added,
+            "receivers_removed": removed,
+            "receivers_updated": updated,
+            "route_updated": before["route"] != after["route"],
+            "others_updated": before["others"] != after["others"],
+        }
+
+    @staticmethod
+    def has_changes(changes: Dict) -> bool:
+        return any(len(v) > 0 if isinstance(v, list) else v for v in changes.values())
+
+    def commit(self) -> bool:
+        changes = self.changes()
+        if not self.has_changes(changes):
+            print("alertmanager config is unchanged; skipping update")
+            return False
+        print("alertmanager config changes: receivers added={0}, removed={1}, updated={2}; "
+              "routes updated={3}".format(changes["receivers_added"], changes["receivers_removed"],
+                                          changes["receivers_updated"], changes["route_updated"]))
+        success = self._g.update_alertmanager_config(json.dumps(self.config,
+                                                                indent=4,
+                                                                sort_keys=True))
+        if not success:
+            raise RuntimeError("failed to update alertmanager config")
+        return True
@@ -1,13 +1,19 @@
 # Usage
 # Create alerts: python3 create_alerts.py --grafana_server "<KFUSE_DNS_NAME>/grafana"
 # --threshold_values_file ./files/alerts_config.csv
+# Plan only: add --plan ./alerts_plan.json, then run again with --apply-plan ./alerts_plan.json
 
 import argparse
 import csv
 import json
+import os
+import sys
 import xxhash
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 from jinja2 import Environment, BaseLoader
+
+# grafana_client imports the HTTP transport shared with ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from grafana_client import GrafanaClient, AlertRule, AlertData
 from loguru import logger as log
 import requests
@@ -28,6 +34,99 @@ SVC_ID_LABELS_AGGR = [
 
 ALERT_FOLDER_NAME = "apm_services_alerts"
 
+# Grafana API calls made by GrafanaClient per operation, used for plan estimates.
+# remove_alerts: folder lookup + delete. upload_alert: folder lookup + rule group post.
+# Creating the missing alert folder adds a folder post + folder lookup once.
+REMOVE_ALERTS_REQUESTS = 2
+CREATE_ALERT_REQUESTS = 2
+CREATE_FOLDER_REQUESTS = 2
+
+# Columns that every row of the alerts config CSV must provide. alert_name is
+# optional; a title is derived from the trigger and service hash when empty.
+ALERTS_CONFIG_REQUIRED_COLUMNS = [
+    "apm_trigger",
+    "service_name",
+    "span_name_pattern",
+    "span_name_matcher_op",
+    "threshold_operator",
+    "threshold_value",
+    "reducer",
+    "service_id_labels",
+    "contact_points"
+]
+SPAN_NAME_MATCHER_OPS = ["=", "!=", "=~", "!~"]
+THRESHOLD_OPERATORS = ["<", "<=", ">", ">=", "=", "==", "!="]
+REDUCERS = ["last", "mean", "min", "max", "sum", "count"]
+
+class AlertsConfigReader:
+    """Streams rows of the alerts config CSV.
+
+    validate() checks the header and every row in a single pass that keeps
+    nothing but the errors in memory, so a bad row deep in a large file is
+    reported before any rule is generated. rows() then yields the rows lazily.
+    """
+
+    def __init__(self, alerts_config_csv: str, apm_triggers: List[str]) -> None:
+        self._alerts_config_csv = alerts_config_csv
+        self._apm_triggers = apm_triggers
+
+    def _validate_header(self, fieldnames: List[str]) -> List[str]:
+        if not fieldnames:
+            return ["file is empty or has no header"]
+        missing = [c for c in ALERTS_CONFIG_REQUIRED_COLUMNS if c not in fieldnames]
+        if missing:
+            return ["header is missing column(s): " + ", ".join(missing)]
+        return []
+
+    def _validate_row(self, row: Dict) -> List[str]:
+        errors = []
+        if None in row:
+            errors.append("has more fields than the header")
+        missing = [c for c in ALERTS_CONFIG_REQUIRED_COLUMNS if row.get(c) is None]
+        if missing:
+            return errors + ["is missing value(s) for: " + ", ".join(missing)]
+
+        if row["apm_trigger"] not in self._apm_triggers:
+            errors.append(f"unknown apm_trigger '{row['apm_trigger']}'")
+        if not row["service_name"]:
+            errors.append("service_name is empty")
+        # the operator is only used when there is a span name pattern
+        if row["span_name_pattern"] and row["span_name_matcher_op"] not in SPAN_NAME_MATCHER_OPS:
+            errors.append(f"unknown span_name_matcher_op '{row['span_name_matcher_op']}'")
+        if row["threshold_operator"] not in THRESHOLD_OPERATORS:
+            errors.append(f"unknown threshold_operator '{row['threshold_operator']}'")
+        try:
+            float(row["threshold_value"])
+        except ValueError:
+            errors.append(f"threshold_value '{row['threshold_value']}' is not a number")
+        if row["reducer"] not in REDUCERS:
+            errors.append(f"unknown reducer '{row['reducer']}'")
+        bad_labels = [kv for kv in row["service_id_labels"].split(";") if "=" not in kv]
+        if bad_labels:
+            errors.append("service_id_labels must be key=value pairs separated by ';', got "
+                          + ", ".join(f"'{kv}'" for kv in bad_labels))
+        if not row["contact_points"]:
+            errors.append("contact_points is empty")
+        return errors
+
+    def validate(self) -> None:
+        errors = []
+        with open(self._alerts_config_csv, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            errors.extend(self._validate_header(reader.fieldnames))
+            if not errors:
+                for row in reader:
+                    errors.extend(f"line {reader.line_num}: {e}" for e in self._validate_row(row))
+
+        if errors:
+            for e in errors:
+                print(f"{self._alerts_config_csv}: {e}")
+            raise RuntimeError(f"{len(errors)} error(s) in alerts config {self._alerts_config_csv}")
+
+    def rows(self) -> Iterator[Dict]:
+        with open(self._alerts_config_csv, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
 class ExprGen:
 
     _alerts_config_csv = None
@@ -136,57 +235,57 @@ class ExprGen:
         alert_tmpls = kwargs.get("alert_tmpls", {})
         alert_rules = {}
         title_counts = {}
-        
-        with open(self._alerts_config_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                name = row['apm_trigger']
-                service_name = row['service_name']
-                service_id_labels = row['service_id_labels'].split(";")
-                service_dict = str_to_dict(row.get("service_id_labels", ""))
-                service_dict["service_name"] = row.get("service_name", "")
-                service_name_hash = ExprGen.get_alert_folder_name(row.get("service_name", ""),
-                                                     service_dict)
-                service_hash = service_name_hash.split("_")[1]
-                expr = self.__get_alert_expr(row, alert_tmpls)
-                contact_points = row["contact_points"].split(";")
-                th_operator = row["threshold_operator"]
-                th_value = row["threshold_value"]
-                alert_title = row["alert_name"]
-
-                reducer = row["reducer"]
-                condition = "$B " + th_operator + " " + th_value
-                
-                group_name = service_name + "_" + service_hash + "_group_1m_1"  
-                d = alert_rules.get(group_name, {})
-
-                if not alert_title:
-                    base_title = name + "_" + service_hash
-                # Ensure title uniqueness to add alerts in same group
-                    if base_title in title_counts:
-                        title_counts[base_title] += 1
-                        unique_title = f"{base_title}_{title_counts[base_title]}"
-                    else:
-                        title_counts[base_title] = 1
-                        unique_title = base_title
-                    d.setdefault('titles', []).append(unique_title)
+
+        reader = AlertsConfigReader(self._alerts_config_csv, list(self._extra_data_dict.keys()))
+        reader.validate()
+        for row in reader.rows():
+            name = row['apm_trigger']
+            service_name = row['service_name']
+            service_id_labels = row['service_id_labels'].split(";")
+            service_dict = str_to_dict(row.get("service_id_labels", ""))
+            service_dict["service_name"] = row.get("service_name", "")
+            service_name_hash = ExprGen.get_alert_folder_name(row.get("service_name", ""),
+                                                              service_dict)
+            service_hash = service_name_hash.split("_")[1]
+            expr = self.__get_alert_expr(row, alert_tmpls)
+            contact_points = row["contact_points"].split(";")
+            th_operator = row["threshold_operator"]
+            th_value = row["threshold_value"]
+            alert_title = row.get("alert_name")
+
+            reducer = row["reducer"]
+            condition = "$B " + th_operator + " " + th_value
+            
+            group_name = service_name + "_" + service_hash + "_group_1m_1"  
+            d = alert_rules.get(group_name, {})
+
+            if not alert_title:
+                base_title = name + "_" + service_hash
+            # Ensure title uniqueness to add alerts in same group
+                if base_title in title_counts:
+                    title_counts[base_title] += 1
+                    unique_title = f"{base_title}_{title_counts[base_title]}"
                 else:
-                    d.setdefault('titles', []).append(alert_title)
-                d.setdefault('exprs', []).append(expr)
-                d.setdefault('reducers', []).append(reducer)
-                d.setdefault('conditions', []).append(condition)
-                d.setdefault('trigger_type', []).append(self._extra_data_dict[name].get("apmTriggerType"))
-                d.setdefault('span_type', []).append(self._extra_data_dict[name].get("spanType"))
-                d.setdefault('service_hash', []).append(service_hash)
-                labels_dict = {item.split('=')[0]: item.split('=')[1] for item in service_id_labels}
-                d.setdefault('unique_labels', []).append(labels_dict)
-                contact_points_dict = {f"{item}" : "true" for item in contact_points}
-                d.setdefault('contact_points', []).append(contact_points_dict)
-                d.setdefault('threshold_operator', []).append(th_operator)
-                d.setdefault('threshold_value', []).append(th_value)
-                d['span_name'] = row["span_name_pattern"]
-                d.setdefault('service_name', []).append(service_name)
-                alert_rules[group_name] = d
+                    title_counts[base_title] = 1
+                    unique_title = base_title
+                d.setdefault('titles', []).append(unique_title)
+            else:
+                d.setdefault('titles', []).append(alert_title)
+            d.setdefault('exprs', []).append(expr)
+            d.setdefault('reducers', []).append(reducer)
+            d.setdefault('conditions', []).append(condition)
+            d.setdefault('trigger_type', []).append(self._extra_data_dict[name].get("apmTriggerType"))
+            d.setdefault('span_type', []).append(self._extra_data_dict[name].get("spanType"))
+            d.setdefault('service_hash', []).append(service_hash)
+            labels_dict = {item.split('=')[0]: item.split('=')[1] for item in service_id_labels}
+            d.setdefault('unique_labels', []).append(labels_dict)
+            contact_points_dict = {f"{item}" : "true" for item in contact_points}
+            d.setdefault('contact_points', []).append(contact_points_dict)
+            d.setdefault('threshold_operator', []).append(th_operator)
+            d.setdefault('threshold_value', []).append(th_value)
+            d['span_name'] = row["span_name_pattern"]
+            d.setdefault('service_name', []).append(service_name)
+            alert_rules[group_name] = d
 
         return alert_rules
 
@@ -311,36 +410,86 @@ def generate_alert_rules(alert_rules_dict: Dict, **kwargs) -> Dict:
 
     return alert_rules
 
-def create_alerts_for_services(g: GrafanaClient, alerts_config_csv: str) -> None:
+def plan_alerts_for_services(g: GrafanaClient, alerts_config_csv: str,
+                             delete_if_not_exist: bool) -> Dict:
     ds_uid, success = g.get_datasource_uid('KfuseDatasource')
     if not success:
         raise RuntimeError("failed to find datasource uid for KfuseDatasource")
-    
+
     te = ThresholdExprGen(alerts_config_csv)
     csv_alerts = te.generate_alert_rules(alert_tmpls=te.get_alert_expr_tmpls())
     existing_alerts = get_existing_alert_rules(g)
-    delete_if_not_exist = args.delete_csv_alerts_if_not_exist
     alerts_to_update, alerts_to_delete = process_alerts_to_delete_and_update(existing_alerts, csv_alerts, delete_if_not_exist)
-    
+    folder_id, status = g.get_folder_id(ALERT_FOLDER_NAME)
+    if not status:
+        raise RuntimeError("Failed to query alert folders in grafana")
+
+    plan = {"folder": ALERT_FOLDER_NAME, "delete": [], "update": []}
     for group_name in alerts_to_delete:
-        print(f"Deleting alerts from group {group_name}")
-        _, success = g.remove_alerts(ALERT_FOLDER_NAME, group_name)
-        if not success:
-            print(f"Failed to delete alerts in folder={ALERT_FOLDER_NAME}, group={group_name}")
-            raise RuntimeError("Failed to remove alerts")
+        plan["delete"].append({"group": group_name, "requests": REMOVE_ALERTS_REQUESTS})
 
     alert_rules = generate_alert_rules(alerts_to_update, ds_uid=ds_uid)
     for group_name, rules in alert_rules.items():
-        print(f"Creating alerts in group {group_name}")
         alert_data = AlertData(
             alert_name=group_name,
             alert_interval="1m",
             alert_folder=ALERT_FOLDER_NAME,
             alert_rules_list=rules
         )
-        create_alerts_on_grafana(g, [alert_data], ALERT_FOLDER_NAME)
+        payload = g.render_alert(alert_data)
+        requests_count = CREATE_ALERT_REQUESTS
+        if not folder_id and len(plan["update"]) == 0:
+            requests_count += CREATE_FOLDER_REQUESTS
+        plan["update"].append({
+            "group": group_name,
+            "rules": len(rules),
+            "requests": requests_count,
+            "payload_bytes": len(payload.encode('utf-8')),
+            "payload": payload
+        })
+
+    plan["totals"] = {
+        "groups_to_delete": len(plan["delete"]),
+        "groups_to_update": len(plan["update"]),
+        "rules_to_update": sum(u["rules"] for u in plan["update"]),
+        "requests": sum(e["requests"] for e in plan["delete"] + plan["update"]),
+        "payload_bytes": sum(u["payload_bytes"] for u in plan["update"])
+    }
+    return plan
+
+def print_alerts_plan(plan: Dict) -> None:
+    for e in plan["delete"]:
+        print(f"delete group {e['group']}: {e['requests']} requests")
+    for e in plan["update"]:
+        print(f"update group {e['group']}: {e['rules']} rules, {e['requests']} requests, "
+              f"{e['payload_bytes']} bytes")
+    totals = plan["totals"]
+    print(f"{totals['groups_to_delete']} groups to delete, {totals['groups_to_update']} groups "
+          f"({totals['rules_to_update']} rules) to update; {totals['requests']} requests, "
+          f"{totals['payload_bytes']} bytes in total")
+
+def apply_alerts_plan(g: GrafanaClient, plan: Dict) -> None:
+    folder = plan["folder"]
+    for e in plan["delete"]:
+        group_name = e["group"]
+        print(f"Deleting alerts from group {group_name}")
+        _, success = g.remove_alerts(folder, group_name)
+        if not success:
+            print(f"Failed to delete alerts in folder={folder}, group={group_name}")
+            raise RuntimeError("Failed to remove alerts")
 
-    return
+    for e in plan["update"]:
+        group_name = e["group"]
+        print(f"Creating alerts in group {group_name}")
+        if not g.upload_alert(folder, e["payload"]):
+            print(f"failed to create alert {group_name}")
+        else:
+            print(f"successfully created alert {group_name}")
+
+def create_alerts_for_services(g: GrafanaClient, alerts_config_csv: str,
+                               delete_if_not_exist: bool) -> None:
+    plan = plan_alerts_for_services(g, alerts_config_csv, delete_if_not_exist)
+    apply_alerts_plan(g, plan)
 
 def process_alerts_to_delete_and_update(existing_alerts: Dict, csv_alerts: Dict, delete_if_not_exist: bool) -> Tuple:
     alerts_to_update = {}
@@ -400,16 +549,6 @@ def get_existing_alert_rules(g: GrafanaClient) -> Dict:
         existing_alerts[group] = d
     return existing_alerts
 
-def create_alerts_on_grafana(g: GrafanaClient, alert_data_list: List[AlertData],
-                             alert_folder_name: str) -> None:
-    for alert_data in alert_data_list:
-        ret = g.create_alert(alert_folder_name, alert_data)
-        if not ret:
-            print(f"failed to create alert {alert_data.alert_name}")
-        else:
-            print(f"successfully created alert {alert_data.alert_name}")
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Script to create APM alerts for a given service")
@@ -424,7 +563,7 @@ if __name__ == "__main__":
         "-p", "--grafana_passwd", help="Grafana password", default="password"
     )
     parser.add_argument(
-        "-t", "--threshold_values_file", required=True,
+        "-t", "--threshold_values_file",
         help="CSV file with config for alert rules (absolute path)"
     )
     parser.add_argument(
@@ -435,7 +574,36 @@ if __name__ == "__main__":
         "-d", "--delete-csv-alerts-if-not-exist", action='store_true',
         help="Delete alert rules in CSV file if they don't exist in CSV file"
     )
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument(
+        "--plan", metavar="PLAN_FILE",
+        help="Write the groups to delete and update, with estimated requests and payload "
+            + "bytes, to PLAN_FILE (JSON) without changing Grafana"
+    )
+    plan_group.add_argument(
+        "--apply-plan", metavar="PLAN_FILE",
+        help="Apply a plan written by --plan without recomputing it"
+    )
     args = parser.parse_args()
+    if not args.apply_plan and not args.threshold_values_file:
+        parser.error("-t/--threshold_values_file is required unless --apply-plan is given")
     gc = GrafanaClient(grafana_server=args.grafana_server, grafana_username=args.grafana_username,
                        grafana_password=args.grafana_passwd, verify_ssl=args.no_verify_ssl)
-    create_alerts_for_services(gc, args.threshold_values_file)
\ No newline at end of file
+    if args.apply_plan:
+        with open(args.apply_plan, 'r', encoding='utf-8') as f:
+            alerts_plan = json.load(f)
+        if alerts_plan.get("grafana_server") != args.grafana_server:
+            raise RuntimeError(f"plan {args.apply_plan} was computed for "
+                               f"{alerts_plan.get('grafana_server')}, not {args.grafana_server}")
+        apply_alerts_plan(gc, alerts_plan)
+    elif args.plan:
+        alerts_plan = plan_alerts_for_services(gc, args.threshold_values_file,
+                                               args.delete_csv_alerts_if_not_exist)
+        alerts_plan["grafana_server"] = args.grafana_server
+        with open(args.plan, 'w', encoding='utf-8') as f:
+            json.dump(alerts_plan, f, indent=4)
+        print_alerts_plan(alerts_plan)
+        print(f"wrote plan to {args.plan}")
+    else:
+        create_alerts_for_services(gc, args.threshold_values_file,
+                                   args.delete_csv_alerts_if_not_exist)
\ No newline at end of file
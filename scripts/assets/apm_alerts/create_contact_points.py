@@ -3,13 +3,18 @@
 # -c ./files/sample_contact_points.csv
 
 import os
+import sys
 import argparse
 import csv
 import json
 from typing import Dict
 from jinja2 import Environment, FileSystemLoader
+
+# grafana_client imports the HTTP transport shared with ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from create_alerts import GrafanaClient
 from grafana_client import CONTACT_POINT_NAME_SUFFIX
+from alertmanager_config import AlertmanagerConfigUpdate
 
 class Receiver:
     type = None
@@ -73,22 +78,19 @@ def merge_alertmanager_config(
     alertmanager_config["alertmanager_config"]["receivers"] = unmanaged_receivers + list(cp_receivers.receivers.values())
     return alertmanager_config
 
-def create_contact_points(g: GrafanaClient, contact_points_file: str) -> None:
+def apply_contact_points(update: AlertmanagerConfigUpdate, contact_points_file: str) -> None:
     receivers = populate_receivers(contact_points_file)
     cp_receivers: ContactPointReceivers = ContactPointReceivers(receivers=receivers)
-    alertmanager_config, success = g.get_alertmanager_config()
-    if not success:
-        raise RuntimeError("failed to get alertmanager config")
-    updated_alertmanager_config = merge_alertmanager_config(alertmanager_config, cp_receivers)
+    update.config = merge_alertmanager_config(update.config, cp_receivers)
+
+def create_contact_points(g: GrafanaClient, contact_points_file: str) -> None:
+    update = AlertmanagerConfigUpdate(g)
+    apply_contact_points(update, contact_points_file)
     with open("./uploading_alertmanager_config.json", "w", encoding='utf-8') as cj:
         print("writing to ./uploading_alertmanager_config.json")
-        cj.write(json.dumps(updated_alertmanager_config, indent=4, sort_keys=True))
-    success = g.update_alertmanager_config(json.dumps(updated_alertmanager_config,
-                                                       indent=4,
-                                                       sort_keys=True))
-    if not success:
-        raise RuntimeError("failed to update alertmanager config")
-    print("successfully updated alertmanager alert config.")
+        cj.write(json.dumps(update.config, indent=4, sort_keys=True))
+    if update.commit():
+        print("successfully updated alertmanager alert config.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -5,10 +5,16 @@
 import argparse
 import json
 import os
+import sys
 from itertools import chain
-from typing import Dict, List
+from typing import Dict, List, Set, Tuple
 from jinja2 import Environment, FileSystemLoader
+
+# grafana_client imports the HTTP transport shared with ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from grafana_client import GrafanaClient, CONTACT_POINT_NAME_SUFFIX
+from alertmanager_config import AlertmanagerConfigUpdate
+from create_contact_points import apply_contact_points
 
 NOTIFICATION_CHANNELS_KEY = "notification_channels"
 
@@ -30,6 +36,12 @@ class Matcher:
         m.__value = l[2]
         return m
 
+    def get_key(self) -> str:
+        return self.__key
+
+    def get_value(self) -> str:
+        return self.__value
+
     def as_dict(self) -> Dict:
         return {
             "key": self.__key,
@@ -53,7 +65,11 @@ class Policy:
     def set_continue(self, cont: bool) -> None:
         self.__continue = cont
 
-    def is_policy_not_script_managed(self, known_policies: List[str]) -> bool:
+    def get_index_key(self) -> Tuple[str, str, str]:
+        matchers = {m.get_key(): m.get_value() for m in self.__matchers}
+        return self.__channel, matchers.get("service_name", ""), matchers.get("span_name", "")
+
+    def is_policy_not_script_managed(self, known_policies: Set[str]) -> bool:
         if self.__channel in known_policies:
             return False
 
@@ -76,50 +92,111 @@ class Policy:
             "nested_routes": self.__nested_routes
         }
 
+class PolicyIndex:
+    """Policies keyed by (channel, service_name, span_name) for constant-time lookups.
+
+    Only the first policy of a key is indexed; the keys of later ones are
+    collected in `duplicates`.
+    """
+
+    def __init__(self, policies: List[Policy]) -> None:
+        self.__index = {}
+        self.duplicates = []
+        for p in policies:
+            key = p.get_index_key()
+            if key in self.__index:
+                self.duplicates.append(key)
+            else:
+                self.__index[key] = p
+
+    def __contains__(self, key: Tuple[str, str, str]) -> bool:
+        return key in self.__index
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def get(self, key: Tuple[str, str, str]) -> Policy:
+        return self.__index.get(key)
+
+    def keys(self) -> List[Tuple[str, str, str]]:
+        return list(self.__index.keys())
+
 class RoutingPolicy:
-    __policies = []
-    __known_policies = []
     def __init__(self, services_config: List) -> None:
+        self.__policies = []
+        self.__known_policies = set()
+        seen = set()
         for svc in services_config:
             for i, ch in enumerate(svc[NOTIFICATION_CHANNELS_KEY]):
-                self.__known_policies.append(ch)
+                self.__known_policies.add(ch)
                 policy = Policy(ch, svc['apm_name'], svc['transactions'], True)
 
                 if i == len(svc[NOTIFICATION_CHANNELS_KEY]) - 1:
                     policy.set_continue(False)
 
+                # Only the first policy of a (channel, service, span) key is kept.
+                key = policy.get_index_key()
+                if key in seen:
+                    channel, service_name, span_name = key
+                    print(f"warning: skipping duplicate policy for channel {channel}, "
+                          f"service {service_name}, span {span_name or '*'}")
+                    continue
+                seen.add(key)
                 self.__policies.append(policy)
 
     def add_policies(self, policies: List[Policy]) -> None:
         self.__policies.extend(policies)
 
-    def get_known_policies(self) -> List:
+    def get_known_policies(self) -> Set[str]:
         return self.__known_policies
 
+    def get_policies(self) -> List[Policy]:
+        return self.__policies
+
     def as_dict(self) -> Dict:
         return {
             "routing_policies": [p.as_dict() for p in self.__policies]
         }
 
-def get_current_receivers_config(g: GrafanaClient) -> Dict:
-    resp, success = g.get_alertmanager_config()
-    if not success:
-        raise RuntimeError("Failed to get existing alert manager config")
-
-    if 'alertmanager_config' not in resp or 'receivers' not in resp['alertmanager_config']:
+def get_current_receivers_config(alertmanager_config: Dict) -> Dict:
+    if 'alertmanager_config' not in alertmanager_config \
+            or 'receivers' not in alertmanager_config['alertmanager_config']:
         raise RuntimeError("Receivers are not defined - run create_contact_points.py before "
                            + "running this script")
 
-    return resp['alertmanager_config']['receivers'],\
-        resp['alertmanager_config']['route'].get('routes', [])
+    return alertmanager_config['alertmanager_config']['receivers'],\
+        alertmanager_config['alertmanager_config']['route'].get('routes', [])
+
+def count_routes(routes: List[Dict]) -> int:
+    return sum(1 + count_routes(r.get('routes') or []) for r in routes)
+
+def diff_policies(existing_policies: List[Policy], routing_policy: RoutingPolicy) -> Dict:
+    known_policies = routing_policy.get_known_policies()
+    existing_index = PolicyIndex([p for p in existing_policies
+                                  if not p.is_policy_not_script_managed(known_policies)])
+    desired_index = PolicyIndex(routing_policy.get_policies())
+    for channel, service_name, span_name in existing_index.duplicates:
+        print(f"warning: duplicate existing policy for channel {channel}, "
+              f"service {service_name}, span {span_name or '*'}")
+
+    added, updated, unchanged = 0, 0, 0
+    for key in desired_index.keys():
+        if key not in existing_index:
+            added += 1
+        elif existing_index.get(key).as_dict() != desired_index.get(key).as_dict():
+            updated += 1
+        else:
+            unchanged += 1
+    removed = sum(1 for key in existing_index.keys() if key not in desired_index)
+    return {"added": added, "removed": removed, "updated": updated, "unchanged": unchanged}
 
 def merge_policies(existing_policies: List[Policy], routing_policy: RoutingPolicy) -> None:
     known_policies = routing_policy.get_known_policies()
     ui_policies = [p for p in existing_policies if p.is_policy_not_script_managed(known_policies)]
     routing_policy.add_policies(ui_policies)
 
-def create_notification_policies(g: GrafanaClient, json_file: str,
-                                 skip_merge_existing_policies: bool) -> None:
+def apply_notification_policies(update: AlertmanagerConfigUpdate, json_file: str,
+                                skip_merge_existing_policies: bool) -> None:
     with open(json_file, 'r', encoding='utf-8') as f:
         j = f.readlines()
         config = json.loads(''.join(j))
@@ -127,21 +204,35 @@ def create_notification_policies(g: GrafanaClient, json_file: str,
     file_dir = os.path.dirname(__file__)
     env = Environment(loader=FileSystemLoader(os.path.join(file_dir, "./files")))
     template = env.get_template("routing_policy_config.json")
-    current_receivers_config, existing_routes = get_current_receivers_config(g)
+    current_receivers_config, existing_routes = get_current_receivers_config(update.config)
     existing_policies = [Policy.from_dict(r) for r in existing_routes]
     services = [c.get('services', []) for c in config.get('clients', [])]
     policies = RoutingPolicy(list(chain.from_iterable(services)))
-    
+    diff = diff_policies(existing_policies, policies)
+
     if not skip_merge_existing_policies:
         merge_policies(existing_policies, policies)
     d = {'receivers': json.dumps(current_receivers_config)}
     d.update(policies.as_dict())
-    routing_policy_json = template.render(d)
-    
-    success = g.update_alertmanager_config(routing_policy_json)
-    if not success:
-        raise RuntimeError("Failed to update alert manager config")
-    print("Updated alert manager config with notification policies")
+    update.config = json.loads(template.render(d))
+
+    routes = update.config['alertmanager_config']['route'].get('routes', [])
+    print("Script managed policies: {0} added, {1} removed, {2} updated, {3} unchanged".format(
+        diff["added"], diff["removed"], diff["updated"], diff["unchanged"]))
+    print(f"Route tree size: {count_routes(existing_routes)} before, {count_routes(routes)} after")
+
+def create_notification_policies(g: GrafanaClient, json_file: str,
+                                 skip_merge_existing_policies: bool,
+                                 contact_points_file: str = None) -> None:
+    update = AlertmanagerConfigUpdate(g)
+    # Contact points are merged first so that the routes below can refer to them
+    # and both land in the same alertmanager config write.
+    if contact_points_file:
+        apply_contact_points(update, contact_points_file)
+    apply_notification_policies(update, json_file, skip_merge_existing_policies)
+
+    if update.commit():
+        print("Updated alert manager config with notification policies")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -166,7 +257,13 @@ if __name__ == "__main__":
         help="JSON file with NR alert policy config "\
             + "(which contains both service name and notification channels)"
     )
+    parser.add_argument(
+        "-c", "--contact_points_file",
+        help="CSV file with config for contact points (absolute path); when set, contact points "
+            + "and notification policies are applied in a single alertmanager config update"
+    )
     args = parser.parse_args()
     gc = GrafanaClient(grafana_server=args.grafana_server, grafana_username=args.grafana_username,
                        grafana_password=args.grafana_passwd)
-    create_notification_policies(gc, args.nr_config_json, args.skip_merge_existing_policies)
+    create_notification_policies(gc, args.nr_config_json, args.skip_merge_existing_policies,
+                                 args.contact_points_file)
@@ -3,11 +3,13 @@ import re
 import json
 from typing import Dict
 from typing import Tuple
-import requests
 from jinja2 import Environment, FileSystemLoader
-from requests.auth import HTTPBasicAuth
 from datetime import timedelta
 
+# The HTTP transport is shared with ../common/grafana_client.py; the entry
+# point scripts put scripts/assets on sys.path.
+from common.grafana_transport import GrafanaTransport
+
 CONTACT_POINT_NAME_SUFFIX = "__kfuse_script_managed"
 
 class AlertRule:
@@ -129,22 +131,22 @@ class GrafanaClient:
         env = Environment(loader=FileSystemLoader(
             os.path.join(file_dir, "./files")))
         self._template = env.get_template("alert_template.json")
+        self._transport = GrafanaTransport(f"{self._scheme}://{self._server}",
+                                           username=self._username, password=self._password,
+                                           verify_ssl=self._verify, headers=self._headers)
 
     def _get_alert_data_json(self, alert_data: AlertData) -> str:
         return self._template.render(alert_data.as_dict())
 
     def _handle_http_request_to_grafana(self, **kwargs) -> Tuple:
         path = kwargs.get("path", "")
-        request_fn = kwargs.get("request_fn", None)
-        if request_fn is None:
-            return {'status': 'invalid request function'}, False
         request_type = kwargs.get("request_type", "")
+        if not request_type:
+            return {'status': 'invalid request type'}, False
         request_body = kwargs.get("request_body", None)
-        full_url = f"{self._scheme}://{self._server}{path}"
-        auth = HTTPBasicAuth(self._username, self._password)
+        full_url = self._transport.url(path)
         success = True
-        response = request_fn(full_url, auth=auth, data=request_body,
-                              headers=self._headers, timeout=30, verify=self._verify)
+        response = self._transport.request(request_type, path, data=request_body)
         if int(response.status_code / 100) != 2:
             print("http {0} returned an error for url {1}; status = {2}, content={3}".format(
                 request_type,
@@ -156,22 +158,19 @@ class GrafanaClient:
         return response, success
 
     def _http_delete_request_to_grafana(self, path) -> Tuple:
-        response, success = self._handle_http_request_to_grafana(request_fn=requests.delete,
-                                                                 path=path,
+        response, success = self._handle_http_request_to_grafana(path=path,
                                                                  request_type="delete")
         return {'status': response.status_code}, success
 
     def _http_get_request_to_grafana(self, path) -> Tuple:
-        response, success = self._handle_http_request_to_grafana(request_fn=requests.get,
-                                                                 path=path,
+        response, success = self._handle_http_request_to_grafana(path=path,
                                                                  request_type="get")
         if not success:
             return {'status': response.status_code}, success
         return response.json(), success
 
     def _http_post_request_to_grafana(self, path, post_data=None) -> bool:
-        _, success = self._handle_http_request_to_grafana(request_fn=requests.post,
-                                                          path=path,
+        _, success = self._handle_http_request_to_grafana(path=path,
                                                           request_type="post",
                                                           request_body=post_data)
         return success
@@ -220,9 +219,11 @@ class GrafanaClient:
         folder_id = next((f.get("uid", None) for f in folder_list if f["title"] == folder), None)
         return folder_id, True
 
-    def create_alert(self, folder, alert_data: AlertData) -> bool:
-        alert_data_json = self._get_alert_data_json(alert_data=alert_data)
-        return self._upload_alert_to_grafana(folder, alert_data_json)
+    def render_alert(self, alert_data: AlertData) -> str:
+        return self._get_alert_data_json(alert_data=alert_data)
+
+    def upload_alert(self, folder, alert_group_json: str) -> bool:
+        return self._upload_alert_to_grafana(folder, alert_group_json)
 
     def remove_alerts(self, folder, name) -> Tuple:
         folder_id, status = self.get_folder_id(folder)
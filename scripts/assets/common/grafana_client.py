@@ -6,9 +6,10 @@ from typing import Tuple
 
 import requests
 from loguru import logger as log
-from requests.auth import HTTPBasicAuth
 from urllib.parse import urlparse
 
+from common.grafana_transport import GrafanaTransport
+
 # Set logging level to INFO
 log.remove()
 log.add(sink=sys.stderr, level="INFO")
@@ -36,19 +37,20 @@ class GrafanaClient:
         if self._auth_token:
             self._headers["Authorization"] = f"Bearer {self._auth_token}"
         self.verify = verify_ssl
+        self._transport = GrafanaTransport(f"{self._scheme}://{self._server}",
+                                           username=self._username, password=self._password,
+                                           auth_token=self._auth_token, verify_ssl=self.verify,
+                                           headers=self._headers)
 
     def _handle_http_request_to_grafana(self, **kwargs) -> Tuple:
         path = kwargs.get("path", "")
-        request_fn = kwargs.get("request_fn", None)
-        if request_fn is None:
-            return {'status': 'invalid request function'}, False
         request_type = kwargs.get("request_type", "")
+        if not request_type:
+            return {'status': 'invalid request type'}, False
         request_body = kwargs.get("request_body", None)
-        full_url = f"{self._scheme}://{self._server}{path}"
-        # Use HTTPBasicAuth only if not using token authentication
-        auth = None if self._auth_token else HTTPBasicAuth(self._username, self._password)
+        full_url = self._transport.url(path)
         success = True
-        response = request_fn(full_url, auth=auth, data=request_body, headers=self._headers, timeout=30, verify=self.verify)
+        response = self._transport.request(request_type, path, data=request_body)
         # log.error("http {0} returned status {1}".format(response.status_code, response.content))
         if response.status_code >= 300:
             log.error("http {0} returned an error for url {1}; status = {2}, content={3}".format(
@@ -62,24 +64,21 @@ class GrafanaClient:
         return response, success
 
     def _http_get_request_to_grafana(self, path: str) -> Tuple:
-        response, success = self._handle_http_request_to_grafana(request_fn=requests.get,
-                                                                 path=path,
+        response, success = self._handle_http_request_to_grafana(path=path,
                                                                  request_type="get")
         if not success:
             return {'status': response.status_code}, success
         return response.json(), success
 
     def _http_post_request_to_grafana(self, path: str, post_data: str = None) -> bool:
-        response, success = self._handle_http_request_to_grafana(request_fn=requests.post,
-                                                                 path=path,
+        response, success = self._handle_http_request_to_grafana(path=path,
                                                                  request_type="post",
                                                                  request_body=post_data)
         log.debug("POST response={0}, success={1}".format(response, success))
         return success
 
     def _http_delete_request_to_grafana(self, path: str) -> Tuple:
-        response, success = self._handle_http_request_to_grafana(request_fn=requests.delete,
-                                                                 path=path,
+        response, success = self._handle_http_request_to_grafana(path=path,
                                                                  request_type="delete")
         if not success:
             return {'status': response.status_code}, success
@@ -203,7 +202,6 @@ class GrafanaClient:
 
         # Use _handle_http_request_to_grafana directly to get the response JSON
         response, status = self._handle_http_request_to_grafana(
-            request_fn=requests.post,
             path=path,
             request_type="post",
             request_body=data
@@ -280,9 +278,7 @@ class GrafanaClient:
 
         # Check if rule group already exists (404 is expected for new groups)
         path = f"/api/ruler/grafana/api/v1/rules/{folder_uid}/{group_name}"
-        full_url = f"{self._scheme}://{self._server}{path}"
-        auth = None if self._auth_token else HTTPBasicAuth(self._username, self._password)
-        response = requests.get(full_url, auth=auth, headers=self._headers, timeout=30, verify=self.verify)
+        response = self._transport.request("get", path)
 
         if response.status_code == 200:
             rule_group_response = response.json()
@@ -0,0 +1,54 @@
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 30)
+DEFAULT_RETRIES = 3
+DEFAULT_POOL_SIZE = 10
+# Only idempotent methods are retried (urllib3's default), so a POST that
+# reached Grafana is never replayed.
+RETRY_STATUS_CODES = [429, 502, 503, 504]
+
+
+class GrafanaTransport:
+    """Pooled, keep-alive HTTP transport shared by the Grafana clients.
+
+    All requests of a client go through one requests.Session, so connections to
+    Grafana are reused across calls instead of being set up for every request.
+    Connection errors and transient statuses are retried with backoff.
+    """
+
+    def __init__(self, base_url: str, username: Optional[str] = None, password: Optional[str] = None,
+                 auth_token: Optional[str] = None, verify_ssl: bool = True,
+                 headers: Optional[Dict] = None,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, pool_size: int = DEFAULT_POOL_SIZE):
+        self._base_url = base_url.rstrip("/")
+        self._timeout = timeout
+
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=RETRY_STATUS_CODES,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(headers or {})
+        self._session.verify = verify_ssl
+        # Use HTTPBasicAuth only if not using token authentication
+        if auth_token:
+            self._session.headers["Authorization"] = f"Bearer {auth_token}"
+        else:
+            self._session.auth = HTTPBasicAuth(username, password)
+
+    def url(self, path: str) -> str:
+        return f"{self._base_url}{path}"
+
+    def request(self, method: str, path: str, data=None) -> requests.Response:
+        return self._session.request(method.upper(), self.url(path), data=data, timeout=self._timeout)
+
+    def close(self) -> None:
+        self._session.close()
@@ -0,0 +1,274 @@
+"""Micro-benchmarks for the VPC flow log Lambda.
+
+Runs without AWS: nothing is flushed, so no API key is needed.
+
+Usage:
+    python3 benchmark.py parse [--records N] [--interfaces N] [--peers N] [--repeat N]
+    python3 benchmark.py protobuf [--points N] [--points-per-series N] [--repeat N]
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+import vpc_flowlog_lambda as flowlog
+
+TAGS = ["region:us-east-1", "aws_account:123456789012"]
+
+
+def synthetic_log_events(records, interfaces=8, peers=64, seed=0):
+    rnd = random.Random(seed)
+    node_ip = "10.0.0.1"
+    peer_ips = ["10.0.%d.%d" % (i // 250 + 1, i % 250 + 1) for i in range(peers)]
+    enis = ["eni-%08x" % i for i in range(interfaces)]
+    start = 1700000000
+    events = []
+    for i in range(records):
+        src, dst = node_ip, rnd.choice(peer_ips)
+        if rnd.random() < 0.5:
+            src, dst = dst, src
+        ts = start + i * 60 // records
+        message = "3 123456789012 %s %s %s %d %d %d %d %d %d %d %s OK vpc-0abc" % (
+            rnd.choice(enis),
+            src,
+            dst,
+            rnd.randint(1024, 65535),
+            rnd.choice([22, 80, 443, 5432]),
+            rnd.choice([6, 6, 6, 17, 1]),
+            rnd.randint(1, 100),
+            rnd.randint(40, 150000),
+            ts,
+            ts + rnd.randint(1, 60),
+            "ACCEPT" if rnd.random() < 0.95 else "REJECT",
+        )
+        events.append({"id": str(i), "timestamp": ts * 1000, "message": message})
+    return events
+
+
+def _histogram_snapshot(values):
+    # Sketches (KF_HISTOGRAM_BACKEND=sketch) are compared by their bins, which
+    # do not depend on the order values were added in.
+    if isinstance(values, flowlog.QuantileSketch):
+        return values.count, sorted(values.bins.items())
+    return sorted(values)
+
+
+def _snapshot():
+    stats = flowlog.stats
+    counts = {
+        (stats.metric_name(m), stats.tags(t), ts): v
+        for (m, t, ts), v in stats.counts.items()
+    }
+    histograms = {
+        (stats.metric_name(m), stats.tags(t), ts): _histogram_snapshot(v)
+        for (m, t, ts), v in stats.histograms.items()
+    }
+    stats._initialize()
+    return counts, histograms
+
+
+# Per-record reference implementation of parse_batch/aggregate_batch, which
+# the batch path is checked against.
+def process_message(message, tags, timestamp, node_ip, flowlog_format=None):
+    """Aggregates a single flow record; returns False if the record does not
+    match the flow log format."""
+    values = (flowlog_format or flowlog.FLOWLOG_FORMAT).split(message)
+    if values is None:
+        return False
+    (
+        interface_id,
+        srcaddr,
+        dstaddr,
+        srcport,
+        dstport,
+        protocol,
+        packets,
+        _bytes,
+        start,
+        end,
+        action,
+        log_status,
+    ) = values
+
+    detailed_tags = [
+        "interface_id:%s" % interface_id,
+        "protocol:%s" % flowlog.protocol_id_to_name(protocol),
+        "ip:%s" % node_ip,
+        "action:%s" % action,
+    ] + tags
+    if srcaddr == node_ip:
+        detailed_tags.append("direction:outbound")
+    if dstaddr == node_ip:
+        detailed_tags.append("direction:inbound")
+    if flowlog.KF_PORT_SERVICE_TAGS:
+        service = flowlog.port_service_name(srcport, dstport)
+        if service:
+            detailed_tags.append("port_service:%s" % service)
+
+    process_log_status(log_status, detailed_tags, timestamp)
+    if log_status == "NODATA":
+        return True
+
+    process_action(action, detailed_tags, timestamp)
+    process_duration(start, end, detailed_tags, timestamp)
+    process_packets(packets, detailed_tags, timestamp)
+    process_bytes(_bytes, detailed_tags, timestamp)
+    return True
+
+
+def compute_node_ip(events, flowlog_format=None):
+    flowlog_format = flowlog_format or flowlog.FLOWLOG_FORMAT
+    src_index, dst_index = flowlog_format.srcaddr_index, flowlog_format.dstaddr_index
+    if src_index is None or dst_index is None:
+        return "unknown"
+    maxsplit = max(src_index, dst_index) + 1
+    ip_count = Counter()
+    for event in events:
+        fields = event["message"].split(" ", maxsplit)
+        if len(fields) < maxsplit:
+            continue
+        src_ip, dest_ip = fields[src_index], fields[dst_index]
+        if len(src_ip) > 1 and len(dest_ip) > 1:  # account for '-'
+            ip_count[src_ip] += 1
+            ip_count[dest_ip] += 1
+    return flowlog.most_common_ip(ip_count)
+
+
+def process_log_status(log_status, tags, timestamp):
+    flowlog.stats.increment(
+        "log_status", tags=["status:%s" % log_status] + tags, timestamp=timestamp
+    )
+
+
+def process_action(action, tags, timestamp):
+    flowlog.stats.increment("action", tags=["action:%s" % action] + tags, timestamp=timestamp)
+
+
+def process_duration(start, end, tags, timestamp):
+    flowlog.stats.histogram(
+        "duration.per_request",
+        int(int(end) - int(start)),
+        tags=tags,
+        timestamp=timestamp,
+    )
+
+
+def process_packets(packets, tags, timestamp):
+    try:
+        flowlog.stats.histogram(
+            "packets.per_request", int(packets), tags=tags, timestamp=timestamp
+        )
+        flowlog.stats.increment("packets.total", int(packets), tags=tags, timestamp=timestamp)
+    except ValueError:
+        pass
+
+
+def process_bytes(_bytes, tags, timestamp):
+    try:
+        flowlog.stats.histogram(
+            "bytes.per_request", int(_bytes), tags=tags, timestamp=timestamp
+        )
+        flowlog.stats.increment("bytes.total", int(_bytes), tags=tags, timestamp=timestamp)
+    except ValueError:
+        pass
+
+
+def run_per_record(events):
+    node_ip = compute_node_ip(events)
+    for event in events:
+        process_message(event["message"], TAGS, event["timestamp"] / 1000, node_ip)
+
+
+def run_batch(events):
+    flowlog.aggregate_batch(flowlog.parse_batch(events), TAGS)
+
+
+def _time(fn, events, repeat):
+    best = None
+    for _ in range(repeat):
+        flowlog.stats._initialize()
+        started = time.perf_counter()
+        fn(events)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, _snapshot()
+
+
+def bench_parse(args):
+    events = synthetic_log_events(args.records, args.interfaces, args.peers)
+    results = {}
+    for name, fn in (("per-record", run_per_record), ("batch", run_batch)):
+        elapsed, results[name] = _time(fn, events, args.repeat)
+        print("%-10s %10.0f records/sec (%.3fs for %d records)" % (
+            name, args.records / elapsed, elapsed, args.records))
+    if results["per-record"] != results["batch"]:
+        raise SystemExit("batch path aggregated different values than the per-record path")
+
+
+def build_payload_by_append(series):
+    # Message construction as Stats.flush did it before add_series: every
+    # series and point is built on its own and then copied into its parent.
+    payload = flowlog.Pb.MetricPayload()
+    for metric, tags, points in series:
+        s = flowlog.Pb.MetricPayload.MetricSeries()
+        s.metric = metric
+        s.tags.extend(tags)
+        for point in points:
+            p = flowlog.Pb.MetricPayload.MetricPoint()
+            p.timestamp = int(point[0])
+            p.value = point[1]
+            s.points.append(p)
+        payload.series.append(s)
+    return payload
+
+
+def build_payload_by_add(series):
+    payload = flowlog.Pb.MetricPayload()
+    for metric, tags, points in series:
+        flowlog.add_series(payload, metric, tags, points)
+    return payload
+
+
+def bench_protobuf(args):
+    series = []
+    for i in range(max(1, args.points // args.points_per_series)):
+        tags = ("interface_id:eni-%08x" % i, "protocol:TCP") + tuple(TAGS)
+        points = [(1700000000 + t + 0.5, float(i * t)) for t in range(args.points_per_series)]
+        series.append(("aws.vpc.flowlogs.bytes.total", tags, points))
+    total_points = sum(len(points) for _, _, points in series)
+
+    serialized = {}
+    for name, fn in (("append", build_payload_by_append), ("add", build_payload_by_add)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            payload = fn(series)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        serialized[name] = payload.SerializeToString()
+        print("%-10s %10.0f points/sec (%.3fs for %d points)" % (
+            name, total_points / best, best, total_points))
+    if serialized["append"] != serialized["add"]:
+        raise SystemExit("add_series built a different payload than the append loop")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VPC flow log Lambda micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    parse = subparsers.add_parser("parse", help="per-record vs batch parse and aggregation")
+    parse.add_argument("--records", type=int, default=50000)
+    parse.add_argument("--interfaces", type=int, default=8)
+    parse.add_argument("--peers", type=int, default=64)
+    parse.add_argument("--repeat", type=int, default=3)
+    parse.set_defaults(func=bench_parse)
+    protobuf = subparsers.add_parser("protobuf", help="MetricPayload construction by append vs add")
+    protobuf.add_argument("--points", type=int, default=100000)
+    protobuf.add_argument("--points-per-series", type=int, default=60)
+    protobuf.add_argument("--repeat", type=int, default=3)
+    protobuf.set_defaults(func=bench_protobuf)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Offline replay harness for the VPC flow log Lambda.
+
+Feeds synthetic CloudWatch Logs subscription events through
+lambda_handler and points the Lambda at a local HTTP sink that decodes the
+submitted payloads, so the whole invocation (decode, parse, aggregation,
+serialization and submission) can be measured without AWS. The API key is
+taken from KF_API_KEY (a placeholder is set when it is missing).
+
+Usage:
+    python3 harness.py [--records N] [--invocations N] [--interfaces N] [--peers N]
+
+Any KF_* setting of the Lambda can be passed through the environment, e.g.
+KF_HISTOGRAM_BACKEND=sketch python3 harness.py --records 100000
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import agent_payload_pb2 as Pb
+
+
+class Sink(object):
+    """Local intake that accepts series and sketch payloads and keeps totals."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                sink.record(self.path, self.headers.get("Content-Encoding"), body)
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def endpoint(self):
+        return "http://127.0.0.1:%d" % self.server.server_port
+
+    def reset(self):
+        with self.lock:
+            self.totals = defaultdict(int)
+
+    def record(self, path, content_encoding, body):
+        wire_bytes = len(body)
+        if content_encoding == "gzip":
+            body = gzip.decompress(body)
+        elif content_encoding == "deflate":
+            body = zlib.decompress(body)
+        if path.endswith("/sketches"):
+            payload = Pb.SketchPayload.FromString(body)
+            series = len(payload.sketches)
+            points = sum(len(s.dogsketches) for s in payload.sketches)
+        else:
+            payload = Pb.MetricPayload.FromString(body)
+            series = len(payload.series)
+            points = sum(len(s.points) for s in payload.series)
+        with self.lock:
+            self.totals["requests"] += 1
+            self.totals["wire_bytes"] += wire_bytes
+            self.totals["payload_bytes"] += len(body)
+            self.totals["series"] += series
+            self.totals["points"] += points
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Context(object):
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:VPCFlowLogs"
+    function_name = "VPCFlowLogs"
+
+    def __init__(self, timeout_ms=900000):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def cloudwatch_event(log_events):
+    data = {
+        "messageType": "DATA_MESSAGE",
+        "owner": "123456789012",
+        "logGroup": "vpc-flow-logs",
+        "logStream": "eni-00000000-all",
+        "subscriptionFilters": ["VPCFlowLogs"],
+        "logEvents": log_events,
+    }
+    compressed = gzip.compress(json.dumps(data).encode("utf-8"))
+    return {"awslogs": {"data": base64.b64encode(compressed).decode("ascii")}}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic flow logs through the Lambda")
+    parser.add_argument("--records", type=int, default=10000, help="flow records per event")
+    parser.add_argument("--invocations", type=int, default=5, help="warm invocations to run")
+    parser.add_argument("--interfaces", type=int, default=8, help="distinct interface ids")
+    parser.add_argument("--peers", type=int, default=64, help="distinct peer addresses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The Lambda reads KFUSE_ENDPOINT when it is imported, so the sink has to
+    # be up first.
+    sink = Sink()
+    os.environ["KFUSE_ENDPOINT"] = sink.endpoint
+    os.environ.setdefault("KF_API_KEY", "harness")
+
+    import_started = time.perf_counter()
+    import vpc_flowlog_lambda as flowlog
+    from benchmark import synthetic_log_events
+
+    print("cold start (import) %.3fs, peak RSS %.1f MB" % (
+        time.perf_counter() - import_started, peak_rss_mb()))
+
+    flush_times = []
+    stats_flush = flowlog.stats.flush
+
+    def timed_flush(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return stats_flush(*a, **kw)
+        finally:
+            flush_times.append(time.perf_counter() - started)
+
+    flowlog.stats.flush = timed_flush
+
+    print("%-4s %10s %12s %10s %10s %8s %8s %12s %12s %8s" % (
+        "inv", "records", "records/s", "total s", "flush s", "reqs", "series",
+        "payload B", "wire B", "RSS MB"))
+    for invocation in range(args.invocations):
+        log_events = synthetic_log_events(
+            args.records, args.interfaces, args.peers, seed=args.seed + invocation
+        )
+        event = cloudwatch_event(log_events)
+        sink.reset()
+        flush_times.clear()
+        started = time.perf_counter()
+        flowlog.lambda_handler(event, Context())
+        elapsed = time.perf_counter() - started
+        totals = sink.totals
+        print("%-4d %10d %12.0f %10.3f %10.3f %8d %8d %12d %12d %8.1f" % (
+            invocation, args.records, args.records / elapsed, elapsed, sum(flush_times),
+            totals["requests"], totals["series"], totals["payload_bytes"],
+            totals["wire_bytes"], peak_rss_mb()))
+
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
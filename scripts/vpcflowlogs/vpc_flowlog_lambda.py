@@ -1,16 +1,30 @@
+import time
+
+# Cold start is measured from here, before the imports below.
+_INIT_STARTED = time.perf_counter()
+
+import array
 import logging
+import math
 import os
 import gzip
 import json
-import time
 import base64
-from io import BufferedReader, BytesIO
+import codecs
+import itertools
+import re
+import signal
+import threading
+import zlib
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from heapq import heapify, heappop, heappush
+from operator import itemgetter
 from collections import defaultdict, Counter
-from urllib.request import Request, urlopen
-from urllib.parse import urlencode
+from io import BytesIO
+from urllib.parse import unquote_plus, urlsplit
 
-import boto3
-import botocore
 import agent_payload_pb2 as Pb
 
 logger = logging.getLogger()
@@ -18,10 +32,89 @@ logger.setLevel(logging.getLevelName(os.environ.get("KF_LOG_LEVEL", "INFO").uppe
 logger.info("Loading function")
 
 KFUSE_ENDPOINT = os.getenv("KFUSE_ENDPOINT", default="<TBA>")
+# "exact" keeps every histogram value and sorts them at flush time; "sketch"
+# folds them into bounded-memory QuantileSketch instances.
+KF_HISTOGRAM_BACKEND = os.getenv("KF_HISTOGRAM_BACKEND", default="exact").lower()
+# "series" submits histograms as min/median/p90/p95/p99/max series; "sketch"
+# submits them as mergeable distribution sketches to the sketch intake.
+KF_DISTRIBUTION_OUTPUT = os.getenv("KF_DISTRIBUTION_OUTPUT", default="series").lower()
+# Payloads are split so that no request carries more than this many series
+# (or sketches) or serialized bytes, and are compressed with "gzip",
+# "deflate" or "identity".
+KF_MAX_SERIES_PER_REQUEST = int(os.getenv("KF_MAX_SERIES_PER_REQUEST", default="1000"))
+KF_MAX_PAYLOAD_BYTES = int(os.getenv("KF_MAX_PAYLOAD_BYTES", default=str(2 * 1024 * 1024)))
+KF_CONTENT_ENCODING = os.getenv("KF_CONTENT_ENCODING", default="gzip").lower()
+KF_FLUSH_CONCURRENCY = int(os.getenv("KF_FLUSH_CONCURRENCY", default="4"))
+KF_SUBMIT_RETRIES = int(os.getenv("KF_SUBMIT_RETRIES", default="3"))
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# Socket timeout in seconds for connecting to and reading from the intake.
+KF_HTTP_TIMEOUT = float(os.getenv("KF_HTTP_TIMEOUT", default="10"))
+# A flush stops sending this many milliseconds before the Lambda times out;
+# chunks it could not deliver by then are spilled to the retry buffer in
+# KF_RETRY_BUFFER_DIR (at most KF_RETRY_BUFFER_MAX_BYTES, oldest dropped
+# first, 0 disables it) and sent again by the next flush.
+KF_FLUSH_DEADLINE_MARGIN_MS = int(os.getenv("KF_FLUSH_DEADLINE_MARGIN_MS", default="1000"))
+KF_RETRY_BUFFER_DIR = os.getenv("KF_RETRY_BUFFER_DIR", default="/tmp/kfuse-retry")
+KF_RETRY_BUFFER_MAX_BYTES = int(
+    os.getenv("KF_RETRY_BUFFER_MAX_BYTES", default=str(64 * 1024 * 1024))
+)
+# Seconds a resolved API key is reused before it is fetched again; 0 keeps it
+# for the lifetime of the container.
+KF_API_KEY_CACHE_TTL = float(os.getenv("KF_API_KEY_CACHE_TTL", default="3600"))
+# Adds a port_service:<name> tag for flows on a well-known port.
+KF_PORT_SERVICE_TAGS = os.getenv("KF_PORT_SERVICE_TAGS", default="false").lower() == "true"
+# Field list of the flow log records, either in the AWS format syntax
+# ("${version} ${account-id} ...") or as space separated field names. Unset
+# means the default version 3 format below.
+KF_FLOWLOG_FORMAT = os.getenv("KF_FLOWLOG_FORMAT", default="")
+# Flow log objects from S3 are parsed, aggregated and flushed in chunks of
+# this many records, so memory stays bounded for hourly files. Parquet objects
+# are the exception: they are read into memory whole, and reading them needs
+# the pyarrow package (e.g. from a Lambda layer), which is not bundled.
+KF_S3_CHUNK_RECORDS = int(os.getenv("KF_S3_CHUNK_RECORDS", default="200000"))
+# Rollup before flush: timestamps are bucketed to KF_ROLLUP_SECONDS windows
+# (0 keeps the record timestamps), and KF_ROLLUP_DROP_TAGS/KF_ROLLUP_KEEP_TAGS
+# map a flow metric name (e.g. "bytes.total", or "*" for all other flow
+# metrics) to the tag keys removed from, or exclusively kept on, its series,
+# as JSON:
+#   KF_ROLLUP_DROP_TAGS='{"*": ["interface_id"], "action": ["protocol"]}'
+KF_ROLLUP_SECONDS = int(os.getenv("KF_ROLLUP_SECONDS", default="0"))
+KF_ROLLUP_DROP_TAGS = os.getenv("KF_ROLLUP_DROP_TAGS", default="")
+KF_ROLLUP_KEEP_TAGS = os.getenv("KF_ROLLUP_KEEP_TAGS", default="")
+# Number of (srcaddr, dstaddr, dstport) tuples reported as top talkers by
+# bytes and by packets on each flush; 0 disables the top talkers series.
+KF_TOP_TALKERS = int(os.getenv("KF_TOP_TALKERS", default="0"))
+# Self-telemetry: "log" writes the stage timings and volume counters of each
+# invocation as one JSON log line, "series" also submits them as
+# aws.vpc.flowlogs.lambda.* series, "none" disables both.
+KF_SELF_TELEMETRY = os.getenv("KF_SELF_TELEMETRY", default="log").lower()
+# Cross-invocation buffering of CloudWatch Logs deliveries: warm invocations
+# only aggregate into the module-level stats, which are flushed once they hold
+# KF_BUFFER_MAX_RECORDS records or the oldest of them arrived
+# KF_BUFFER_MAX_AGE_SECONDS ago. 0 records flushes every invocation. The age
+# is only checked when an invocation arrives, so buffering invocations also
+# write the buffered data to a checkpoint next to the retry buffer; a
+# new runtime process in the same execution environment (after a timeout or
+# crash) sends it with its first flush. A recycled execution environment
+# loses its /tmp as well, so there buffered data is best effort: SIGTERM
+# triggers a last flush, but Lambda only sends it when an extension is
+# registered.
+KF_BUFFER_MAX_RECORDS = int(os.getenv("KF_BUFFER_MAX_RECORDS", default="0"))
+KF_BUFFER_MAX_AGE_SECONDS = float(os.getenv("KF_BUFFER_MAX_AGE_SECONDS", default="60"))
+# Writing the checkpoint serializes everything buffered so far, so it is only
+# rewritten once the previous one is this many seconds old; a crash loses the
+# deliveries since then. 0 rewrites it on every buffering invocation.
+KF_BUFFER_CHECKPOINT_SECONDS = float(
+    os.getenv("KF_BUFFER_CHECKPOINT_SECONDS", default="10")
+)
 
 
 def _kfuse_keys():
+    # boto3 is only imported by the branches that call AWS, so deployments
+    # with a plain KF_API_KEY never load it.
     if "kmsEncryptedKeys" in os.environ:
+        import boto3
+
         KMS_ENCRYPTED_KEYS = os.environ["kmsEncryptedKeys"]
         kms = boto3.client("kms")
         # kmsEncryptedKeys should be created through the Lambda's encryption
@@ -36,6 +129,8 @@ def _kfuse_keys():
         )
 
     if "KF_API_KEY_SECRET_ARN" in os.environ:
+        import boto3
+
         SECRET_ARN = os.environ["KF_API_KEY_SECRET_ARN"]
         KF_API_KEY = boto3.client("secretsmanager").get_secret_value(
             SecretId=SECRET_ARN
@@ -43,6 +138,8 @@ def _kfuse_keys():
         return {"api_key": KF_API_KEY}
 
     if "KF_API_KEY_SSM_NAME" in os.environ:
+        import boto3
+
         SECRET_NAME = os.environ["KF_API_KEY_SSM_NAME"]
         KF_API_KEY = boto3.client("ssm").get_parameter(
             Name=SECRET_NAME, WithDecryption=True
@@ -50,6 +147,9 @@ def _kfuse_keys():
         return {"api_key": KF_API_KEY}
 
     if "KF_KMS_API_KEY" in os.environ:
+        import boto3
+        import botocore
+
         ENCRYPTED = os.environ["KF_KMS_API_KEY"]
         try:
             KF_API_KEY = boto3.client("kms").decrypt(
@@ -87,359 +187,1821 @@ def _kfuse_keys():
         "Kloudfuse API key is not defined, see documentation for environment variable options"
     )
 
-kfuse_keys = _kfuse_keys()
-logger.info("Lambda function initialized, ready to send metrics")
-
-
-def process_message(message, tags, timestamp, node_ip):
-    (
-        version,
-        account_id,
-        interface_id,
-        srcaddr,
-        dstaddr,
-        srcport,
-        dstport,
-        protocol,
-        packets,
-        _bytes,
-        start,
-        end,
-        action,
-        log_status,
-        vpcid,
-    ) = message.split(" ")
-
-    detailed_tags = [
-        "interface_id:%s" % interface_id,
-        "protocol:%s" % protocol_id_to_name(protocol),
-        "ip:%s" % node_ip,
-        "action:%s" % action,
-    ] + tags
-    if srcaddr == node_ip:
-        detailed_tags.append("direction:outbound")
-    if dstaddr == node_ip:
-        detailed_tags.append("direction:inbound")
-
-    process_log_status(log_status, detailed_tags, timestamp)
-    if log_status == "NODATA":
-        return
+_kfuse_keys_cache = None
+_kfuse_keys_expiry = 0
+
+
+def get_kfuse_keys():
+    """Returns the Kloudfuse keys, resolving them on first use and again
+    once KF_API_KEY_CACHE_TTL has passed. They are only kept in memory; if a
+    refresh fails, the previous keys stay in use until the next attempt."""
+    global _kfuse_keys_cache, _kfuse_keys_expiry
+    now = time.monotonic()
+    if _kfuse_keys_cache is not None and (
+        KF_API_KEY_CACHE_TTL <= 0 or now < _kfuse_keys_expiry
+    ):
+        return _kfuse_keys_cache
+    started = time.perf_counter()
+    try:
+        kfuse_keys = _kfuse_keys()
+    except Exception as e:
+        if _kfuse_keys_cache is None:
+            raise
+        logger.warning(f"Refreshing the Kloudfuse API key failed, using the cached key: {e}")
+        return _kfuse_keys_cache
+    _kfuse_keys_cache = kfuse_keys
+    _kfuse_keys_expiry = now + KF_API_KEY_CACHE_TTL
+    logger.info(
+        "Resolved Kloudfuse API key in %.1f ms" % ((time.perf_counter() - started) * 1000)
+    )
+    return _kfuse_keys_cache
+
+
+PROTOCOL_NAMES = {
+    0: "HOPOPT",
+    1: "ICMP",
+    2: "IGMP",
+    3: "GGP",
+    4: "IPv4",
+    5: "ST",
+    6: "TCP",
+    7: "CBT",
+    8: "EGP",
+    9: "IGP",
+    10: "BBN-RCC-MON",
+    11: "NVP-II",
+    12: "PUP",
+    13: "ARGUS",
+    14: "EMCON",
+    15: "XNET",
+    16: "CHAOS",
+    17: "UDP",
+    18: "MUX",
+    19: "DCN-MEAS",
+    20: "HMP",
+    21: "PRM",
+    22: "XNS-IDP",
+    23: "TRUNK-1",
+    24: "TRUNK-2",
+    25: "LEAF-1",
+    26: "LEAF-2",
+    27: "RDP",
+    28: "IRTP",
+    29: "ISO-TP4",
+    30: "NETBLT",
+    31: "MFE-NSP",
+    32: "MERIT-INP",
+    33: "DCCP",
+    34: "3PC",
+    35: "IDPR",
+    36: "XTP",
+    37: "DDP",
+    38: "IDPR-CMTP",
+    39: "TP++",
+    40: "IL",
+    41: "IPv6",
+    42: "SDRP",
+    43: "IPv6-Route",
+    44: "IPv6-Frag",
+    45: "IDRP",
+    46: "RSVP",
+    47: "GRE",
+    48: "DSR",
+    49: "BNA",
+    50: "ESP",
+    51: "AH",
+    52: "I-NLSP",
+    53: "SWIPE",
+    54: "NARP",
+    55: "MOBILE",
+    56: "TLSP",
+    57: "SKIP",
+    58: "IPv6-ICMP",
+    59: "IPv6-NoNxt",
+    60: "IPv6-Opts",
+    62: "CFTP",
+    64: "SAT-EXPAK",
+    65: "KRYPTOLAN",
+    66: "RVD",
+    67: "IPPC",
+    69: "SAT-MON",
+    70: "VISA",
+    71: "IPCV",
+    72: "CPNX",
+    73: "CPHB",
+    74: "WSN",
+    75: "PVP",
+    76: "BR-SAT-MON",
+    77: "SUN-ND",
+    78: "WB-MON",
+    79: "WB-EXPAK",
+    80: "ISO-IP",
+    81: "VMTP",
+    82: "SECURE-VMTP",
+    83: "VINES",
+    84: "TTP",
+    84: "IPTM",
+    85: "NSFNET-IGP",
+    86: "DGP",
+    87: "TCF",
+    88: "EIGRP",
+    89: "OSPFIGP",
+    90: "Sprite-RPC",
+    91: "LARP",
+    92: "MTP",
+    93: "AX.25",
+    94: "IPIP",
+    95: "MICP",
+    96: "SCC-SP",
+    97: "ETHERIP",
+    98: "ENCAP",
+    100: "GMTP",
+    101: "IFMP",
+    102: "PNNI",
+    103: "PIM",
+    104: "ARIS",
+    105: "SCPS",
+    106: "QNX",
+    107: "A/N",
+    108: "IPComp",
+    109: "SNP",
+    110: "Compaq-Peer",
+    111: "IPX-in-IP",
+    112: "VRRP",
+    113: "PGM",
+    115: "L2TP",
+    116: "DDX",
+    117: "IATP",
+    118: "STP",
+    119: "SRP",
+    120: "UTI",
+    121: "SMP",
+    122: "SM",
+    123: "PTP",
+    124: "ISIS",
+    125: "FIRE",
+    126: "CRTP",
+    127: "CRUDP",
+    128: "SSCOPMCE",
+    129: "IPLT",
+    130: "SPS",
+    131: "PIPE",
+    132: "SCTP",
+    133: "FC",
+    134: "RSVP-E2E-IGNORE",
+    135: "Mobility",
+    136: "UDPLite",
+    137: "MPLS-in-IP",
+    138: "manet",
+    139: "HIP",
+    140: "Shim6",
+    141: "WESP",
+    142: "ROHC",
+}
+
+# Protocol names indexed by IANA protocol number; None for unassigned numbers.
+PROTOCOL_TABLE = [PROTOCOL_NAMES.get(number) for number in range(256)]
+
+# Well-known ports tagged as port_service:<name> when KF_PORT_SERVICE_TAGS is
+# enabled. Keyed by the port string as it appears in the flow record.
+PORT_SERVICES = {
+    "20": "ftp-data",
+    "21": "ftp",
+    "22": "ssh",
+    "23": "telnet",
+    "25": "smtp",
+    "53": "dns",
+    "67": "dhcp",
+    "68": "dhcp",
+    "80": "http",
+    "110": "pop3",
+    "123": "ntp",
+    "143": "imap",
+    "161": "snmp",
+    "389": "ldap",
+    "443": "https",
+    "445": "smb",
+    "465": "smtps",
+    "587": "submission",
+    "636": "ldaps",
+    "993": "imaps",
+    "995": "pop3s",
+    "1433": "mssql",
+    "1521": "oracle",
+    "2049": "nfs",
+    "2379": "etcd",
+    "3306": "mysql",
+    "3389": "rdp",
+    "5432": "postgresql",
+    "5439": "redshift",
+    "5671": "amqps",
+    "5672": "amqp",
+    "6379": "redis",
+    "6443": "kubernetes-api",
+    "8080": "http-alt",
+    "8443": "https-alt",
+    "9092": "kafka",
+    "9200": "elasticsearch",
+    "11211": "memcached",
+    "27017": "mongodb",
+}
+
+DEFAULT_FLOWLOG_FIELDS = [
+    "version",
+    "account-id",
+    "interface-id",
+    "srcaddr",
+    "dstaddr",
+    "srcport",
+    "dstport",
+    "protocol",
+    "packets",
+    "bytes",
+    "start",
+    "end",
+    "action",
+    "log-status",
+    "vpc-id",
+]
+
+
+class FlowLogFormat(object):
+    """Field layout of flow log records, compiled once into an index map.
+
+    Records may use any default or custom format (v2 to v5 fields such as
+    pkt-srcaddr, tcp-flags or flow-direction); split() only picks out the
+    METRIC_FIELDS the Lambda aggregates, so wider formats cost no more per
+    record than the default one. Metric fields the format does not contain
+    read as "-", like fields AWS could not fill in.
+    """
+
+    METRIC_FIELDS = (
+        "interface-id",
+        "srcaddr",
+        "dstaddr",
+        "srcport",
+        "dstport",
+        "protocol",
+        "packets",
+        "bytes",
+        "start",
+        "end",
+        "action",
+        "log-status",
+    )
+
+    def __init__(self, fields, version=None):
+        # Parquet files and Athena tables spell field names with underscores.
+        self.fields = [f.replace("_", "-") for f in fields]
+        # Only records starting with this version are accepted, if set.
+        self.version = version
+        index = {name: i for i, name in enumerate(self.fields)}
+        self.missing_fields = [f for f in self.METRIC_FIELDS if f not in index]
+        # Missing fields point one past the last field, where split() appends
+        # a "-".
+        self._getter = itemgetter(
+            *[index.get(f, len(self.fields)) for f in self.METRIC_FIELDS]
+        )
+        self.srcaddr_index = index.get("srcaddr")
+        self.dstaddr_index = index.get("dstaddr")
+
+    @classmethod
+    def parse(cls, spec):
+        """Builds a format from "${field} ${field} ..." or a header line."""
+        if "${" in spec:
+            fields = re.findall(r"\$\{([A-Za-z0-9_-]+)\}", spec)
+        else:
+            fields = spec.split()
+        if not fields:
+            raise ValueError("Flow log format %r has no fields" % spec)
+        return cls(fields)
+
+    def split(self, message):
+        """Returns the METRIC_FIELDS values of a record, or None if the record
+        does not match the format."""
+        if self.version is not None and not message.startswith(self.version):
+            return None
+        fields = message.split(" ")
+        if len(fields) != len(self.fields):
+            return None
+        if self.missing_fields:
+            fields.append("-")
+        return self._getter(fields)
+
+
+if KF_FLOWLOG_FORMAT:
+    FLOWLOG_FORMAT = FlowLogFormat.parse(KF_FLOWLOG_FORMAT)
+else:
+    FLOWLOG_FORMAT = FlowLogFormat(DEFAULT_FLOWLOG_FIELDS, version="3")
+if FLOWLOG_FORMAT.missing_fields:
+    logger.warning(
+        "Flow log format has no %s fields, they are reported as '-'"
+        % ", ".join(FLOWLOG_FORMAT.missing_fields)
+    )
+
+# Marks a numeric column entry whose field was "-" or otherwise not an integer.
+MISSING = -(2 ** 63)
 
-    process_action(action, detailed_tags, timestamp)
-    process_duration(start, end, detailed_tags, timestamp)
-    process_packets(packets, detailed_tags, timestamp)
-    process_bytes(_bytes, detailed_tags, timestamp)
 
+class FlowLogBatch(object):
+    """Columns of the supported flow records of one CloudWatch Logs batch.
 
-def compute_node_ip(events):
-    ip_count = Counter()
-    for event in events:
-        src_ip, dest_ip = event["message"].split(" ", 5)[3:5]
-        if len(src_ip) > 1 and len(dest_ip) > 1:  # account for '-'
-            ip_count[src_ip] += 1
-            ip_count[dest_ip] += 1
-    most_comm = ip_count.most_common()
+    String fields are kept as lists and numeric fields as array-backed int64
+    columns, so a batch is split once and then aggregated group by group
+    instead of record by record.
+    """
+
+    def __init__(self):
+        self.timestamps = []
+        self.interface_ids = []
+        self.srcaddrs = []
+        self.dstaddrs = []
+        self.protocols = []
+        self.actions = []
+        self.log_statuses = []
+        # port service names; only filled in when KF_PORT_SERVICE_TAGS is set
+        self.services = []
+        # destination ports; only filled in when KF_TOP_TALKERS is set
+        self.dstports = []
+        self.packets = array.array("q")
+        self.bytes = array.array("q")
+        self.durations = array.array("q")
+        self.unsupported = 0
+        self.node_ip = "unknown"
+        # interface id -> node IP; only filled in for batches that mix
+        # interfaces, see parse_batch
+        self.node_ips = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return MISSING
+
+
+def parse_batch(log_events, flowlog_format=None, per_interface=False):
+    """Parses log events into a FlowLogBatch. The events of a CloudWatch
+    subscription all come from one network interface, so by default one node
+    IP is picked for the batch; `per_interface` picks one per interface id,
+    for records read from S3 where interfaces are mixed."""
+    batch = FlowLogBatch()
+    services = {}
+    split = (flowlog_format or FLOWLOG_FORMAT).split
+    for event in log_events:
+        values = split(event["message"])
+        if values is None:
+            batch.unsupported += 1
+            continue
+        (
+            interface_id,
+            srcaddr,
+            dstaddr,
+            srcport,
+            dstport,
+            protocol,
+            packets,
+            _bytes,
+            start,
+            end,
+            action,
+            log_status,
+        ) = values
+        timestamp = event["timestamp"]
+        if timestamp is not None:
+            batch.timestamps.append(timestamp / 1000)
+        else:
+            # Records read from S3 have no ingestion time; use the flow start.
+            timestamp = _to_int(start)
+            batch.timestamps.append(timestamp if timestamp != MISSING else int(time.time()))
+        batch.interface_ids.append(interface_id)
+        batch.srcaddrs.append(srcaddr)
+        batch.dstaddrs.append(dstaddr)
+        batch.protocols.append(protocol)
+        batch.actions.append(action)
+        batch.log_statuses.append(log_status)
+        if KF_PORT_SERVICE_TAGS:
+            ports = (srcport, dstport)
+            service = services.get(ports, MISSING)
+            if service is MISSING:
+                service = services[ports] = port_service_name(srcport, dstport)
+            batch.services.append(service)
+        if KF_TOP_TALKERS:
+            batch.dstports.append(dstport)
+        batch.packets.append(_to_int(packets))
+        batch.bytes.append(_to_int(_bytes))
+        start, end = _to_int(start), _to_int(end)
+        batch.durations.append(
+            MISSING if MISSING in (start, end) else end - start
+        )
+    # The address columns already hold every src/dst address, so the node IP
+    # is counted from them instead of tokenizing the batch a second time.
+    started = time.perf_counter()
+    if per_interface:
+        ip_count = Counter(zip(batch.interface_ids, batch.srcaddrs))
+        ip_count.update(zip(batch.interface_ids, batch.dstaddrs))
+        interface_ip_counts = defaultdict(Counter)
+        for (interface_id, ip), count in ip_count.items():
+            interface_ip_counts[interface_id][ip] = count
+        batch.node_ips = {
+            interface_id: most_common_ip(counts)
+            for interface_id, counts in interface_ip_counts.items()
+        }
+    else:
+        ip_count = Counter(batch.srcaddrs)
+        ip_count.update(batch.dstaddrs)
+        batch.node_ip = most_common_ip(ip_count)
+    telemetry.add("node_ip", time.perf_counter() - started)
+    return batch
+
+
+def aggregate_batch(batch, tags, node_ip=None):
+    # Records that share every tag and the timestamp are folded into one
+    # group: counters are summed and histogram values collected per group, so
+    # tag lists are built and Stats is called once per group, not per record.
+    node_ips = None
+    if node_ip is None:
+        node_ip, node_ips = batch.node_ip, batch.node_ips
+    if node_ips is None:
+        outbound = [srcaddr == node_ip for srcaddr in batch.srcaddrs]
+        inbound = [dstaddr == node_ip for dstaddr in batch.dstaddrs]
+    else:
+        outbound = [
+            srcaddr == node_ips[interface_id]
+            for interface_id, srcaddr in zip(batch.interface_ids, batch.srcaddrs)
+        ]
+        inbound = [
+            dstaddr == node_ips[interface_id]
+            for interface_id, dstaddr in zip(batch.interface_ids, batch.dstaddrs)
+        ]
+    groups = {}
+    services = batch.services or [None] * len(batch)
+    for i in range(len(batch)):
+        key = (
+            batch.timestamps[i],
+            batch.interface_ids[i],
+            batch.protocols[i],
+            batch.actions[i],
+            batch.log_statuses[i],
+            outbound[i],
+            inbound[i],
+            services[i],
+        )
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [
+                0, array.array("q"), array.array("q"), array.array("q")
+            ]
+        group[0] += 1
+        if batch.log_statuses[i] == "NODATA":
+            continue
+        for values, value in (
+            (group[1], batch.durations[i]),
+            (group[2], batch.packets[i]),
+            (group[3], batch.bytes[i]),
+        ):
+            if value != MISSING:
+                values.append(value)
+
+    if stats.top_talkers is not None:
+        stats.top_talkers.update(batch, tags)
+
+    protocol_names = {}
+    for key, (count, durations, packets, _bytes) in groups.items():
+        (
+            timestamp,
+            interface_id,
+            protocol,
+            action,
+            log_status,
+            outbound,
+            inbound,
+            service,
+        ) = key
+        protocol_name = protocol_names.get(protocol)
+        if protocol_name is None:
+            protocol_name = protocol_names[protocol] = protocol_id_to_name(protocol)
+        detailed_tags = [
+            "interface_id:%s" % interface_id,
+            "protocol:%s" % protocol_name,
+            "ip:%s" % (node_ip if node_ips is None else node_ips[interface_id]),
+            "action:%s" % action,
+        ] + tags
+        if outbound:
+            detailed_tags.append("direction:outbound")
+        if inbound:
+            detailed_tags.append("direction:inbound")
+        if service:
+            detailed_tags.append("port_service:%s" % service)
+
+        stats.increment(
+            "log_status",
+            count,
+            tags=["status:%s" % log_status] + detailed_tags,
+            timestamp=timestamp,
+        )
+        if log_status == "NODATA":
+            continue
+        stats.increment(
+            "action", count, tags=["action:%s" % action] + detailed_tags, timestamp=timestamp
+        )
+        if durations:
+            stats.histogram_extend(
+                "duration.per_request", durations, tags=detailed_tags, timestamp=timestamp
+            )
+        if packets:
+            stats.histogram_extend(
+                "packets.per_request", packets, tags=detailed_tags, timestamp=timestamp
+            )
+            stats.increment("packets.total", sum(packets), tags=detailed_tags, timestamp=timestamp)
+        if _bytes:
+            stats.histogram_extend(
+                "bytes.per_request", _bytes, tags=detailed_tags, timestamp=timestamp
+            )
+            stats.increment("bytes.total", sum(_bytes), tags=detailed_tags, timestamp=timestamp)
+
+
+def most_common_ip(ip_count):
+    ip_count.pop("-", None)
+    most_comm = ip_count.most_common(1)
     if most_comm:
         if most_comm[0][1] > 1:  # we have several events
-            return ip_count.most_common()[0][0]
+            return most_comm[0][0]
     return "unknown"
 
 
 def protocol_id_to_name(protocol):
     if protocol == "-":
         return protocol
-    protocol_map = {
-        0: "HOPOPT",
-        1: "ICMP",
-        2: "IGMP",
-        3: "GGP",
-        4: "IPv4",
-        5: "ST",
-        6: "TCP",
-        7: "CBT",
-        8: "EGP",
-        9: "IGP",
-        10: "BBN-RCC-MON",
-        11: "NVP-II",
-        12: "PUP",
-        13: "ARGUS",
-        14: "EMCON",
-        15: "XNET",
-        16: "CHAOS",
-        17: "UDP",
-        18: "MUX",
-        19: "DCN-MEAS",
-        20: "HMP",
-        21: "PRM",
-        22: "XNS-IDP",
-        23: "TRUNK-1",
-        24: "TRUNK-2",
-        25: "LEAF-1",
-        26: "LEAF-2",
-        27: "RDP",
-        28: "IRTP",
-        29: "ISO-TP4",
-        30: "NETBLT",
-        31: "MFE-NSP",
-        32: "MERIT-INP",
-        33: "DCCP",
-        34: "3PC",
-        35: "IDPR",
-        36: "XTP",
-        37: "DDP",
-        38: "IDPR-CMTP",
-        39: "TP++",
-        40: "IL",
-        41: "IPv6",
-        42: "SDRP",
-        43: "IPv6-Route",
-        44: "IPv6-Frag",
-        45: "IDRP",
-        46: "RSVP",
-        47: "GRE",
-        48: "DSR",
-        49: "BNA",
-        50: "ESP",
-        51: "AH",
-        52: "I-NLSP",
-        53: "SWIPE",
-        54: "NARP",
-        55: "MOBILE",
-        56: "TLSP",
-        57: "SKIP",
-        58: "IPv6-ICMP",
-        59: "IPv6-NoNxt",
-        60: "IPv6-Opts",
-        62: "CFTP",
-        64: "SAT-EXPAK",
-        65: "KRYPTOLAN",
-        66: "RVD",
-        67: "IPPC",
-        69: "SAT-MON",
-        70: "VISA",
-        71: "IPCV",
-        72: "CPNX",
-        73: "CPHB",
-        74: "WSN",
-        75: "PVP",
-        76: "BR-SAT-MON",
-        77: "SUN-ND",
-        78: "WB-MON",
-        79: "WB-EXPAK",
-        80: "ISO-IP",
-        81: "VMTP",
-        82: "SECURE-VMTP",
-        83: "VINES",
-        84: "TTP",
-        84: "IPTM",
-        85: "NSFNET-IGP",
-        86: "DGP",
-        87: "TCF",
-        88: "EIGRP",
-        89: "OSPFIGP",
-        90: "Sprite-RPC",
-        91: "LARP",
-        92: "MTP",
-        93: "AX.25",
-        94: "IPIP",
-        95: "MICP",
-        96: "SCC-SP",
-        97: "ETHERIP",
-        98: "ENCAP",
-        100: "GMTP",
-        101: "IFMP",
-        102: "PNNI",
-        103: "PIM",
-        104: "ARIS",
-        105: "SCPS",
-        106: "QNX",
-        107: "A/N",
-        108: "IPComp",
-        109: "SNP",
-        110: "Compaq-Peer",
-        111: "IPX-in-IP",
-        112: "VRRP",
-        113: "PGM",
-        115: "L2TP",
-        116: "DDX",
-        117: "IATP",
-        118: "STP",
-        119: "SRP",
-        120: "UTI",
-        121: "SMP",
-        122: "SM",
-        123: "PTP",
-        124: "ISIS",
-        125: "FIRE",
-        126: "CRTP",
-        127: "CRUDP",
-        128: "SSCOPMCE",
-        129: "IPLT",
-        130: "SPS",
-        131: "PIPE",
-        132: "SCTP",
-        133: "FC",
-        134: "RSVP-E2E-IGNORE",
-        135: "Mobility",
-        136: "UDPLite",
-        137: "MPLS-in-IP",
-        138: "manet",
-        139: "HIP",
-        140: "Shim6",
-        141: "WESP",
-        142: "ROHC",
-    }
-    return protocol_map.get(int(protocol), protocol)
+    number = int(protocol)
+    if 0 <= number < len(PROTOCOL_TABLE):
+        return PROTOCOL_TABLE[number] or protocol
+    return protocol
 
 
-def process_log_status(log_status, tags, timestamp):
-    stats.increment(
-        "log_status", tags=["status:%s" % log_status] + tags, timestamp=timestamp
-    )
+def port_service_name(srcport, dstport):
+    # The well-known side of a flow is its service; if both ports are known
+    # (e.g. 80 -> 443) the lower one is used.
+    src = PORT_SERVICES.get(srcport)
+    dst = PORT_SERVICES.get(dstport)
+    if src and dst:
+        return src if int(srcport) < int(dstport) else dst
+    return src or dst
+
+
+def split_payload(payload, field, max_items, max_bytes):
+    """Splits `payload.<field>` into payloads of the same type that hold at
+    most `max_items` entries and roughly `max_bytes` serialized bytes each.
+    A single entry larger than `max_bytes` is sent on its own."""
+    chunks = []
+    chunk, items, size = None, 0, 0
+    for item in getattr(payload, field):
+        # entry size plus its field tag and length prefix
+        item_size = item.ByteSize() + 6
+        if chunk is None or items >= max_items or (items and size + item_size > max_bytes):
+            chunk = type(payload)()
+            chunks.append(chunk)
+            items, size = 0, 0
+        getattr(chunk, field).add().CopyFrom(item)
+        items += 1
+        size += item_size
+    return chunks
 
 
-def process_action(action, tags, timestamp):
-    stats.increment("action", tags=["action:%s" % action] + tags, timestamp=timestamp)
+def encode_payload(data):
+    if KF_CONTENT_ENCODING == "gzip":
+        return gzip.compress(data, compresslevel=6), "gzip"
+    if KF_CONTENT_ENCODING == "deflate":
+        return zlib.compress(data, 6), "deflate"
+    return data, None
 
 
-def process_duration(start, end, tags, timestamp):
-    stats.histogram(
-        "duration.per_request",
-        int(int(end) - int(start)),
-        tags=tags,
-        timestamp=timestamp,
+class ConnectionPool(object):
+    """Keep-alive HTTP(S) connections shared by all flushes of a container.
+
+    The pool lives at module level, so warm Lambda invocations reuse the
+    connections (and TLS sessions) opened by earlier ones. Idle connections
+    are handed out most recently used first; a connection the server has
+    closed in the meantime is replaced transparently by PayloadSubmitter.
+    """
+
+    # errors raised when sending on a connection the server already closed
+    STALE_CONNECTION_ERRORS = (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        BrokenPipeError,
+        ConnectionResetError,
     )
 
+    def __init__(self, timeout=KF_HTTP_TIMEOUT, max_idle=KF_FLUSH_CONCURRENCY):
+        self.timeout = timeout
+        self.max_idle = max(1, max_idle)
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
 
-def process_packets(packets, tags, timestamp):
-    try:
-        stats.histogram(
-            "packets.per_request", int(packets), tags=tags, timestamp=timestamp
-        )
-        stats.increment("packets.total", int(packets), tags=tags, timestamp=timestamp)
-    except ValueError:
-        pass
+    def acquire(self, scheme, netloc):
+        """Returns (connection, reused)."""
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if idle:
+                return idle.pop(), True
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return conn, False
+
+    def release(self, scheme, netloc, conn):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+http_pool = ConnectionPool()
+
+
+class SubmitError(RuntimeError):
+    def __init__(self, message, retryable):
+        super().__init__(message)
+        # False for responses the intake will never accept, e.g. a 400
+        self.retryable = retryable
+        # True once the chunk is kept in the retry buffer
+        self.buffered = False
+
+
+class RetryBuffer(object):
+    """Encoded chunks that could not be delivered, kept as files in /tmp.
+
+    Each file holds a JSON header line with the url and content encoding,
+    followed by the request body. /tmp survives between invocations of a
+    warm container, so the next flush picks the chunks up again. Files are
+    written atomically and the oldest ones are dropped beyond max_bytes.
+    """
+
+    SUFFIX = ".chunk"
+
+    def __init__(self, directory=KF_RETRY_BUFFER_DIR, max_bytes=KF_RETRY_BUFFER_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _files(self):
+        try:
+            names = sorted(
+                n for n in os.listdir(self.directory) if n.endswith(self.SUFFIX)
+            )
+        except FileNotFoundError:
+            return []
+        except OSError as e:
+            logger.warning(f"Could not list the retry buffer {self.directory}: {e}")
+            return []
+        return [os.path.join(self.directory, n) for n in names]
+
+    def spill(self, url, body, content_encoding):
+        """Writes a chunk to the buffer and returns its path. Spilling is best
+        effort: if the chunk cannot be written (e.g. /tmp is full) it is
+        dropped and None is returned."""
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        name = "%020d-%d-%06d%s" % (time.time_ns(), os.getpid(), sequence, self.SUFFIX)
+        path = os.path.join(self.directory, name)
+        header = json.dumps({"url": url, "content_encoding": content_encoding})
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(header.encode("utf-8") + b"\n")
+                f.write(body)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not write {len(body)} bytes for {url} to the retry buffer: {e}")
+            try:
+                os.remove(path + ".tmp")
+            except OSError:
+                pass
+            return None
+        self._trim()
+        return path
+
+    def _trim(self):
+        with self._lock:
+            files = self._files()
+            sizes = {}
+            for path in files:
+                try:
+                    sizes[path] = os.path.getsize(path)
+                except OSError:
+                    pass
+            total = sum(sizes.values())
+            for path in files:
+                if total <= self.max_bytes:
+                    break
+                logger.warning(f"Retry buffer is full, dropping {path}")
+                total -= sizes.get(path, 0)
+                self.remove(path)
+
+    def move_to(self, other):
+        """Moves every chunk of this buffer into the buffer `other`."""
+        for path in self._files():
+            try:
+                os.makedirs(other.directory, exist_ok=True)
+                os.replace(path, os.path.join(other.directory, os.path.basename(path)))
+            except OSError as e:
+                logger.warning(f"Could not move {path} to {other.directory}: {e}")
+
+    def replace(self, chunks):
+        """Replaces the content of the buffer with `chunks`, a list of (url,
+        body, content_encoding). The previous chunks are only removed once
+        all new ones are written."""
+        previous = self._files()
+        written = []
+        for url, body, content_encoding in chunks:
+            path = self.spill(url, body, content_encoding)
+            if not path:
+                for path in written:
+                    self.remove(path)
+                return False
+            written.append(path)
+        for path in previous:
+            self.remove(path)
+        return True
+
+    def clear(self):
+        for path in self._files():
+            self.remove(path)
+
+    def load(self):
+        """Returns (url, body, content_encoding, path) for every buffered chunk."""
+        chunks = []
+        for path in self._files():
+            try:
+                with open(path, "rb") as f:
+                    header = json.loads(f.readline())
+                    body = f.read()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable retry buffer file {path}: {e}")
+                self.remove(path)
+                continue
+            chunks.append((header["url"], body, header["content_encoding"], path))
+        return chunks
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove retry buffer file {path}: {e}")
+
+
+retry_buffer = RetryBuffer()
+# encoded copy of the data buffered across invocations, see KF_BUFFER_MAX_RECORDS
+checkpoint_buffer = RetryBuffer(os.path.join(KF_RETRY_BUFFER_DIR, "checkpoint"))
+
+
+class PayloadSubmitter(object):
+    """Posts payload chunks concurrently over pooled keep-alive connections,
+    with a bounded number of retries per chunk.
+
+    With a deadline, no attempt, backoff or socket wait runs past it. Chunks
+    that are still undelivered then, or that failed with a retryable error,
+    go to the retry buffer instead of failing the invocation; chunks already
+    in the buffer are sent along with the new ones. Chunks rejected with a
+    non-retryable status are logged and dropped.
+    """
+
+    def __init__(
+        self,
+        concurrency=KF_FLUSH_CONCURRENCY,
+        retries=KF_SUBMIT_RETRIES,
+        pool=None,
+        buffer=None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.pool = pool or http_pool
+        self.buffer = buffer or retry_buffer
+
+    def _send(self, parts, path, body, headers, timeout):
+        """Sends one request and returns its status. A pooled connection that
+        turns out to be stale is dropped and the request is sent once more on
+        a new connection without counting as a retry."""
+        while True:
+            conn, reused = self.pool.acquire(parts.scheme, parts.netloc)
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request("POST", path, body, headers)
+                response = conn.getresponse()
+                response.read()
+            except ConnectionPool.STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self.pool.release(parts.scheme, parts.netloc, conn)
+            return response.status
+
+    def _post(self, url, body, content_encoding, deadline=None):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = "%s?%s" % (path, parts.query)
+        headers = {"Content-Type": "application/x-protobuf"}
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+
+        status, error = None, "deadline reached"
+        for attempt in range(self.retries + 1):
+            timeout = self.pool.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+            try:
+                status = self._send(parts, path, body, headers, timeout)
+            except (http.client.HTTPException, OSError) as e:
+                status, error = None, e
+            if status is not None and status < 400:
+                return status
+            if status is not None and status not in RETRY_STATUS_CODES:
+                raise SubmitError(
+                    f"Submitting to {url} failed with status {status}", retryable=False
+                )
+            if attempt < self.retries:
+                backoff = 0.2 * 2 ** attempt
+                if deadline is not None and time.monotonic() + backoff >= deadline:
+                    break
+                time.sleep(backoff)
+        if status is None:
+            raise SubmitError(f"Submitting to {url} failed: {error}", retryable=True)
+        raise SubmitError(f"Submitting to {url} failed with status {status}", retryable=True)
+
+    def submit(self, requests, deadline=None):
+        """`requests` is a list of (url, payload) pairs; payloads are
+        serialized, compressed and posted in parallel, together with the
+        chunks waiting in the retry buffer. `deadline` is a time.monotonic()
+        value."""
+        chunks = [(url, payload, None, None, None) for url, payload in requests]
+        if self.buffer.enabled:
+            chunks.extend(
+                (url, None, body, content_encoding, path)
+                for url, body, content_encoding, path in self.buffer.load()
+            )
+
+        def send(chunk):
+            url, payload, body, content_encoding, buffered_path = chunk
+            if payload is not None:
+                started = time.perf_counter()
+                data = payload.SerializeToString()
+                body, content_encoding = encode_payload(data)
+                telemetry.add("serialize", time.perf_counter() - started)
+                telemetry.add("payload_bytes", len(data))
+            try:
+                status = self._post(url, body, content_encoding, deadline)
+            except SubmitError as e:
+                if e.retryable and self.buffer.enabled:
+                    e.buffered = buffered_path is not None or bool(
+                        self.buffer.spill(url, body, content_encoding)
+                    )
+                elif buffered_path is not None:
+                    self.buffer.remove(buffered_path)
+                return url, None, len(body), e
+            if buffered_path is not None:
+                self.buffer.remove(buffered_path)
+            return url, status, len(body), None
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, max(1, len(chunks)))
+        ) as executor:
+            results = list(executor.map(send, chunks))
+
+        # Failing the invocation makes Lambda retry all of it, which would
+        # resend the chunks that were accepted. That is only done when nothing
+        # was delivered and the failure may be transient; any other failed
+        # chunk is logged and dropped.
+        delivered = any(error is None or error.buffered for _, _, _, error in results)
+        errors = []
+        for url, status, sent_bytes, error in results:
+            if error is None:
+                logger.info(f"INFO Submitted {sent_bytes} bytes to {url} with status {status}")
+                telemetry.add("requests", 1)
+                telemetry.add("wire_bytes", sent_bytes)
+            elif error.buffered:
+                logger.warning(f"{error}; keeping {sent_bytes} bytes in the retry buffer")
+            elif error.retryable and not self.buffer.enabled and not delivered:
+                errors.append(error)
+            else:
+                logger.error(f"{error}; dropping {sent_bytes} bytes")
+        if errors:
+            raise errors[0]
+        return results
+
+
+class QuantileSketch(object):
+    """Bounded-memory quantile sketch with relative-error bins.
+
+    Values are mapped to logarithmic bins using the Datadog agent's default
+    sketch parameters (relative accuracy 1/128, minimum value 1e-9, at most
+    4096 bins), so quantiles are within ~1% of the exact value and the bins
+    can be shipped as-is in a SketchPayload Dogsketch. append/extend mirror
+    the list interface used by Stats for exact histograms.
+    """
+
+    gamma_ln = math.log1p(2.0 / 128)
+    min_value = 1e-9
+    bias = -int(math.floor(math.log(min_value) / gamma_ln)) + 1
+    max_key = 32767
+    bin_limit = 4096
+
+    __slots__ = ("bins", "count", "min", "max", "sum")
+
+    def __init__(self):
+        self.bins = {}
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0
+
+    @classmethod
+    def key(cls, value):
+        if value < 0:
+            return -cls.key(-value)
+        if value < cls.min_value:
+            return 0
+        key = int(math.floor(math.log(value) / cls.gamma_ln + 0.5)) + cls.bias
+        return max(1, min(key, cls.max_key))
+
+    @classmethod
+    def value(cls, key):
+        if key < 0:
+            return -cls.value(-key)
+        if key == 0:
+            return 0.0
+        return math.exp((key - cls.bias) * cls.gamma_ln)
+
+    def append(self, value):
+        key = self.key(value)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.bins) > self.bin_limit:
+            self._collapse()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def _collapse(self):
+        # Fold the lowest bins into one, as the agent does, so that
+        # memory stays bounded and upper quantiles stay accurate.
+        keys = sorted(self.bins)
+        excess = keys[: len(keys) - self.bin_limit + 1]
+        folded = sum(self.bins.pop(k) for k in excess)
+        target = excess[-1]
+        self.bins[target] = self.bins.get(target, 0) + folded
+
+    def merge(self, other):
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.bin_limit:
+            self._collapse()
+
+    def value_at_rank(self, rank):
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return max(self.min, min(self.value(key), self.max))
+        return self.max
+
+    def __len__(self):
+        return self.count
 
 
-def process_bytes(_bytes, tags, timestamp):
+def _rollup_tag_rules(name, value):
+    if not value:
+        return {}
     try:
-        stats.histogram(
-            "bytes.per_request", int(_bytes), tags=tags, timestamp=timestamp
-        )
-        stats.increment("bytes.total", int(_bytes), tags=tags, timestamp=timestamp)
-    except ValueError:
-        pass
+        rules = json.loads(value)
+    except ValueError as e:
+        raise ValueError("%s is not valid JSON: %s" % (name, e))
+    if not isinstance(rules, dict) or not all(
+        isinstance(keys, list) for keys in rules.values()
+    ):
+        raise ValueError("%s must map metric names to lists of tag keys" % name)
+    prefix = "aws.vpc.flowlogs."
+    return {
+        metric[len(prefix):] if metric.startswith(prefix) else metric: frozenset(keys)
+        for metric, keys in rules.items()
+    }
+
+
+ROLLUP_DROP_TAGS = _rollup_tag_rules("KF_ROLLUP_DROP_TAGS", KF_ROLLUP_DROP_TAGS)
+ROLLUP_KEEP_TAGS = _rollup_tag_rules("KF_ROLLUP_KEEP_TAGS", KF_ROLLUP_KEEP_TAGS)
+# Tag rules only apply to the flow metrics: the top talker series are defined
+# by their src/dst/dstport tags, and the lambda.* series are self-telemetry.
+ROLLUP_EXEMPT_PREFIXES = ("top_talkers.", "lambda.")
+
+
+class SpaceSaving(object):
+    """Weighted Space-Saving summary of the heaviest items of a stream.
+
+    At most `capacity` items are tracked. A new item replaces the lightest
+    tracked one and inherits its count as overestimation error, so every
+    item heavier than total/capacity is guaranteed to be tracked. The
+    lightest item is found through a heap with lazily discarded entries.
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "_heap")
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+
+    def add(self, item, weight):
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+        elif len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+        else:
+            evicted, floor = self._pop_lightest()
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[item] = floor + weight
+            self.errors[item] = floor
+        heappush(self._heap, (counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, i) for i, count in counts.items()]
+            heapify(self._heap)
+
+    def _pop_lightest(self):
+        # Entries whose count is outdated belong to items that were updated
+        # or evicted since they were pushed.
+        while True:
+            count, item = heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def top(self, k):
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+
+class TopTalkers(object):
+    """Heaviest (srcaddr, dstaddr, dstport) tuples by bytes and by packets.
+
+    Each batch is first summed per tuple and then folded into two
+    Space-Saving summaries of 10 * k entries, so memory stays bounded no
+    matter how many peers a flush covers.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.bytes = SpaceSaving(10 * k)
+        self.packets = SpaceSaving(10 * k)
+        self.tags = []
+        self.timestamp = None
+
+    def update(self, batch, tags):
+        byte_totals = defaultdict(int)
+        packet_totals = defaultdict(int)
+        for talker, _bytes, packets in zip(
+            zip(batch.srcaddrs, batch.dstaddrs, batch.dstports), batch.bytes, batch.packets
+        ):
+            if _bytes != MISSING:
+                byte_totals[talker] += _bytes
+            if packets != MISSING:
+                packet_totals[talker] += packets
+        for talker, total in byte_totals.items():
+            self.bytes.add(talker, total)
+        for talker, total in packet_totals.items():
+            self.packets.add(talker, total)
+        self.tags = tags
+        if batch.timestamps:
+            timestamp = int(max(batch.timestamps))
+            self.timestamp = max(self.timestamp or 0, timestamp)
+
+    def emit(self, stats):
+        for metric, summary in (
+            ("top_talkers.bytes", self.bytes),
+            ("top_talkers.packets", self.packets),
+        ):
+            for (srcaddr, dstaddr, dstport), total in summary.top(self.k):
+                stats.increment(
+                    metric,
+                    total,
+                    tags=["src:%s" % srcaddr, "dst:%s" % dstaddr, "dstport:%s" % dstport]
+                    + self.tags,
+                    timestamp=self.timestamp,
+                )
+
+
+def add_series(payload, metric, tags, points):
+    """Appends a series with its (timestamp, value) points to a MetricPayload,
+    creating each message in place instead of building and copying it."""
+    add_point = payload.series.add(metric=metric, tags=tags).points.add
+    for timestamp, value in points:
+        add_point(timestamp=int(timestamp), value=value)
+
+
+class Telemetry(object):
+    """Where the time of an invocation goes, and how much data it handled.
+
+    Stage timers are in seconds and do not overlap, except that serializing
+    and compressing the chunks runs on the submit workers while they post:
+    that time is summed over the workers into "serialize" and is also part
+    of the "submit" wall time. Besides the per-invocation totals, the values
+    recorded since the last flush are kept in `unreported` for emit(), so
+    the serialize and submit time of a flush is reported by the next one.
+    """
+
+    STAGES = ("decode", "node_ip", "parse_aggregate", "serialize", "submit")
+    COUNTERS = ("records", "series", "points", "payload_bytes", "wire_bytes", "requests")
+    # a timed iterator adds its time to the totals every this many items
+    ITER_REPORT_INTERVAL = 4096
+
+    def __init__(self, mode=KF_SELF_TELEMETRY):
+        self.enabled = mode != "none"
+        self.emit_series = mode == "series"
+        self.lock = threading.Lock()
+        self.unreported = dict.fromkeys(self.STAGES + self.COUNTERS, 0)
+        self.reset()
+
+    def reset(self, tags=None):
+        """Starts the totals of a new invocation."""
+        self.started = time.perf_counter()
+        self.totals = dict.fromkeys(self.STAGES + self.COUNTERS, 0)
+        self.tags = tags or []
+
+    def add(self, name, value):
+        with self.lock:
+            self.totals[name] += value
+            self.unreported[name] += value
+
+    @contextmanager
+    def timed(self, stage, exclude=()):
+        """Adds the wall time of the block to `stage`, less the time the
+        `exclude` stages recorded while it ran."""
+        nested = sum(self.totals[name] for name in exclude)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.add(stage, elapsed - (sum(self.totals[name] for name in exclude) - nested))
+
+    def timed_iter(self, iterable, stage):
+        """Yields the items of `iterable` and adds the time spent producing
+        them to `stage`."""
+        if not self.enabled:
+            yield from iterable
+            return
+        perf_counter = time.perf_counter
+        iterator = iter(iterable)
+        elapsed, items = 0.0, 0
+        try:
+            while True:
+                started = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += perf_counter() - started
+                    return
+                elapsed += perf_counter() - started
+                items += 1
+                if items == self.ITER_REPORT_INTERVAL:
+                    self.add(stage, elapsed)
+                    elapsed, items = 0.0, 0
+                yield item
+        finally:
+            self.add(stage, elapsed)
+
+    def emit(self, stats):
+        """Adds the values recorded since the last call to `stats` as
+        lambda.* series (stage timers in milliseconds)."""
+        with self.lock:
+            unreported = self.unreported
+            self.unreported = dict.fromkeys(self.STAGES + self.COUNTERS, 0)
+        for name in self.STAGES:
+            stats.increment("lambda.%s_ms" % name, unreported[name] * 1000, tags=self.tags)
+        for name in self.COUNTERS:
+            stats.increment("lambda.%s" % name, unreported[name], tags=self.tags)
+
+    def log(self):
+        if not self.enabled:
+            return
+        totals = dict(self.totals)
+        duration = time.perf_counter() - self.started
+        record = {"telemetry": "invocation", "duration_ms": round(duration * 1000, 3)}
+        for name in self.STAGES:
+            record["%s_ms" % name] = round(totals[name] * 1000, 3)
+        for name in self.COUNTERS:
+            record[name] = totals[name]
+        if totals["records"]:
+            record["us_per_record"] = round(duration * 1e6 / totals["records"], 3)
+        logger.info(json.dumps(record))
 
 
 class Stats(object):
     def _initialize(self):
-        self.counts = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-        self.histograms = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        # Counters and histograms are keyed by (metric_id, tagset_id, timestamp).
+        # Metric names and tag sets are interned to integer ids once per
+        # invocation; their string forms are only materialized in flush().
+        self.counts = defaultdict(int)
+        use_sketches = "sketch" in (KF_HISTOGRAM_BACKEND, KF_DISTRIBUTION_OUTPUT)
+        self.histograms = defaultdict(QuantileSketch if use_sketches else list)
+        self._metric_ids = {}
+        self._metric_names = []
+        self._tagset_ids = {}
+        self._sorted_tagset_ids = {}
+        self._tagsets = []
+        # (metric_id, tagset_id) -> tagset_id after the rollup tag rules
+        self._rollup_tagset_ids = {}
+        self.top_talkers = TopTalkers(KF_TOP_TALKERS) if KF_TOP_TALKERS > 0 else None
+        # records aggregated since the last flush, and when the first arrived
+        self.records = 0
+        self.first_record_at = None
+        self.checkpointed_at = None
 
     def __init__(self):
         self._initialize()
         self.metric_prefix = "aws.vpc.flowlogs"
 
-    def increment(self, metric, value=1, timestamp=None, tags=None):
-        metric_name = "%s.%s" % (self.metric_prefix, metric)
+    def metric_id(self, metric):
+        metric_id = self._metric_ids.get(metric)
+        if metric_id is None:
+            metric_id = self._metric_ids[metric] = len(self._metric_names)
+            self._metric_names.append("%s.%s" % (self.metric_prefix, metric))
+        return metric_id
+
+    def tagset_id(self, tags):
+        key = tuple(tags)
+        tagset_id = self._tagset_ids.get(key)
+        if tagset_id is None:
+            # Tag lists that only differ in order share the id of their sorted form.
+            sorted_key = tuple(sorted(key))
+            tagset_id = self._sorted_tagset_ids.get(sorted_key)
+            if tagset_id is None:
+                tagset_id = self._sorted_tagset_ids[sorted_key] = len(self._tagsets)
+                self._tagsets.append(sorted_key)
+            self._tagset_ids[key] = tagset_id
+        return tagset_id
+
+    def metric_name(self, metric_id):
+        return self._metric_names[metric_id]
+
+    def tags(self, tagset_id):
+        return self._tagsets[tagset_id]
+
+    def rollup_tagset_id(self, metric, metric_id, tagset_id):
+        key = (metric_id, tagset_id)
+        rolled_up_id = self._rollup_tagset_ids.get(key)
+        if rolled_up_id is None and metric.startswith(ROLLUP_EXEMPT_PREFIXES):
+            rolled_up_id = self._rollup_tagset_ids[key] = tagset_id
+        if rolled_up_id is None:
+            keep = ROLLUP_KEEP_TAGS.get(metric, ROLLUP_KEEP_TAGS.get("*"))
+            drop = ROLLUP_DROP_TAGS.get(metric, ROLLUP_DROP_TAGS.get("*", frozenset()))
+            tags = [
+                tag
+                for tag in self._tagsets[tagset_id]
+                if (keep is None or tag.split(":", 1)[0] in keep)
+                and tag.split(":", 1)[0] not in drop
+            ]
+            rolled_up_id = self._rollup_tagset_ids[key] = self.tagset_id(tags)
+        return rolled_up_id
+
+    def _key(self, metric, tags, timestamp):
         timestamp = timestamp or int(time.time())
-        _tags = ",".join(sorted(tags))
-        self.counts[metric_name][_tags][timestamp] += value
+        if KF_ROLLUP_SECONDS > 0:
+            timestamp = int(timestamp) // KF_ROLLUP_SECONDS * KF_ROLLUP_SECONDS
+        metric_id = self.metric_id(metric)
+        tagset_id = self.tagset_id(tags)
+        if ROLLUP_DROP_TAGS or ROLLUP_KEEP_TAGS:
+            tagset_id = self.rollup_tagset_id(metric, metric_id, tagset_id)
+        return (metric_id, tagset_id, timestamp)
+
+    def increment(self, metric, value=1, timestamp=None, tags=None):
+        self.counts[self._key(metric, tags, timestamp)] += value
 
     def histogram(self, metric, value=1, timestamp=None, tags=None):
-        metric_name = "%s.%s" % (self.metric_prefix, metric)
-        timestamp = timestamp or int(time.time())
-        _tags = ",".join(sorted(tags))
-        self.histograms[metric_name][_tags][timestamp].append(value)
+        self.histograms[self._key(metric, tags, timestamp)].append(value)
+
+    def histogram_extend(self, metric, values, timestamp=None, tags=None):
+        self.histograms[self._key(metric, tags, timestamp)].extend(values)
 
-    def flush(self):
+    def buffer(self, records):
+        if records and self.first_record_at is None:
+            self.first_record_at = time.monotonic()
+        self.records += records
+
+    def flush_due(self):
+        """Whether the records buffered since the last flush reached one of
+        the KF_BUFFER_* limits; always true when buffering is off."""
+        if KF_BUFFER_MAX_RECORDS <= 0 or self.records >= KF_BUFFER_MAX_RECORDS:
+            return True
+        return (
+            self.first_record_at is not None
+            and time.monotonic() - self.first_record_at >= KF_BUFFER_MAX_AGE_SECONDS
+        )
+
+    def _series_payload(self):
         percentiles_to_submit = [0, 50, 90, 95, 99, 100]
         payload = Pb.MetricPayload()
 
-        for metric_name, count_payload in self.counts.items():
-            for tag_set, datapoints in count_payload.items():
-                points = [(ts, val) for ts, val in datapoints.items()]
-                s = Pb.MetricPayload.MetricSeries()
-                s.metric = metric_name
-                s.tags.extend(tag_set.split(","))
-                for point in points:
-                    p = Pb.MetricPayload.MetricPoint()
-                    p.timestamp = int(point[0])
-                    p.value = point[1]
-                    s.points.append(p)
-                payload.series.append(s)
-
-        for metric_name, histogram_payload in self.histograms.items():
-            for tag_set, datapoints in histogram_payload.items():
-                percentiles = defaultdict(list)
-                for ts, values in datapoints.items():
-                    values.sort()
-                    total_points = len(values)
-                    for pct in percentiles_to_submit:
-                        percentiles[pct].append(
-                            (ts, values[max(0, int((pct - 1) * total_points / 100))])
-                        )
-
-                for pct, points in percentiles.items():
-                    metric_suffix = "p%s" % pct
-                    if pct == 0:
-                        metric_suffix = "min"
-                    if pct == 50:
-                        metric_suffix = "median"
-                    if pct == 100:
-                        metric_suffix = "max"
-                    s = Pb.MetricPayload.MetricSeries()
-                    s.metric = "%s.%s" % (metric_name, metric_suffix)
-                    s.tags.extend(tag_set.split(","))
-                    for point in points:
-                        p = Pb.MetricPayload.MetricPoint()
-                        p.timestamp = int(point[0])
-                        p.value = point[1]
-                        s.points.append(p)
-                    payload.series.append(s)
+        count_series = defaultdict(list)
+        for (metric_id, tagset_id, ts), val in self.counts.items():
+            count_series[(metric_id, tagset_id)].append((ts, val))
+
+        for (metric_id, tagset_id), points in count_series.items():
+            add_series(
+                payload, self._metric_names[metric_id], self._tagsets[tagset_id], points
+            )
+
+        if KF_DISTRIBUTION_OUTPUT == "sketch":
+            return payload
+
+        histogram_series = defaultdict(lambda: defaultdict(list))
+        for (metric_id, tagset_id, ts), values in self.histograms.items():
+            if isinstance(values, list):
+                values.sort()
+                value_at_rank = values.__getitem__
+            else:
+                value_at_rank = values.value_at_rank
+            total_points = len(values)
+            percentiles = histogram_series[(metric_id, tagset_id)]
+            for pct in percentiles_to_submit:
+                percentiles[pct].append(
+                    (ts, value_at_rank(max(0, int((pct - 1) * total_points / 100))))
+                )
+
+        for (metric_id, tagset_id), percentiles in histogram_series.items():
+            for pct, points in percentiles.items():
+                metric_suffix = "p%s" % pct
+                if pct == 0:
+                    metric_suffix = "min"
+                if pct == 50:
+                    metric_suffix = "median"
+                if pct == 100:
+                    metric_suffix = "max"
+                add_series(
+                    payload,
+                    "%s.%s" % (self._metric_names[metric_id], metric_suffix),
+                    self._tagsets[tagset_id],
+                    points,
+                )
+
+        return payload
+
+    def _sketch_payload(self):
+        # One Sketch per metric and tag set, with one Dogsketch per second;
+        # sub-second timestamps of the same second are merged into a new
+        # sketch, so the ones in self.histograms are left as they are.
+        sketches = defaultdict(dict)
+        for (metric_id, tagset_id, ts), sketch in self.histograms.items():
+            by_second = sketches[(metric_id, tagset_id)]
+            merged = by_second.get(int(ts))
+            if merged is None:
+                merged = by_second[int(ts)] = QuantileSketch()
+            merged.merge(sketch)
+
+        payload = Pb.SketchPayload()
+        for (metric_id, tagset_id), by_second in sketches.items():
+            s = payload.sketches.add(
+                metric=self._metric_names[metric_id], tags=self._tagsets[tagset_id]
+            )
+            for ts, sketch in by_second.items():
+                keys, counts = [], []
+                for key in sorted(sketch.bins):
+                    n = sketch.bins[key]
+                    # Bin counts are uint16 in the agent; larger counts are
+                    # split over repeated keys.
+                    while n > 0:
+                        keys.append(key)
+                        counts.append(min(n, 0xFFFF))
+                        n -= 0xFFFF
+                s.dogsketches.add(
+                    ts=ts,
+                    cnt=sketch.count,
+                    min=sketch.min,
+                    max=sketch.max,
+                    avg=sketch.sum / sketch.count,
+                    sum=sketch.sum,
+                    k=keys,
+                    n=counts,
+                )
+        return payload
+
+    def flush(self, context=None, deadline=None):
+        """Submits everything aggregated so far. The submit deadline is
+        taken from the Lambda `context`, or else from `deadline` (a
+        time.monotonic() value)."""
+        # Normally cached already, see lambda_handler.
+        kfuse_keys = get_kfuse_keys()
+        if self.top_talkers is not None:
+            self.top_talkers.emit(self)
+        if telemetry.emit_series:
+            telemetry.emit(self)
+        with telemetry.timed("serialize"):
+            requests = self._requests(kfuse_keys)
+            for _, chunk in requests:
+                if isinstance(chunk, Pb.SketchPayload):
+                    telemetry.add("series", len(chunk.sketches))
+                    telemetry.add("points", sum(len(s.dogsketches) for s in chunk.sketches))
+                else:
+                    telemetry.add("series", len(chunk.series))
+                    telemetry.add("points", sum(len(s.points) for s in chunk.series))
 
         self._initialize()
 
-        creds = urlencode(kfuse_keys)
-        data = payload.SerializeToString()
+        if context is not None:
+            deadline = time.monotonic() + (
+                context.get_remaining_time_in_millis() - KF_FLUSH_DEADLINE_MARGIN_MS
+            ) / 1000
+        try:
+            with telemetry.timed("submit"):
+                PayloadSubmitter().submit(requests, deadline)
+        finally:
+            # Undelivered chunks are in the retry buffer by now.
+            checkpoint_buffer.clear()
+
+    def _requests(self, kfuse_keys):
+        """(url, payload) chunks of everything aggregated so far."""
         url = "%s" % (
             kfuse_keys.get("api_host", "%s/api/v2/series" % KFUSE_ENDPOINT)
         )
-        req = Request(url, data, {"Content-Type": "application/x-protobuf"})
-        response = urlopen(req)
-        logger.info(f"INFO Submitted data with status {response.getcode()}")
+        series_chunks = split_payload(
+            self._series_payload(), "series", KF_MAX_SERIES_PER_REQUEST, KF_MAX_PAYLOAD_BYTES
+        )
+        requests = [(url, chunk) for chunk in series_chunks]
+        if KF_DISTRIBUTION_OUTPUT == "sketch" and self.histograms:
+            sketch_url = kfuse_keys.get(
+                "sketch_api_host", "%s/api/beta/sketches" % KFUSE_ENDPOINT
+            )
+            sketch_chunks = split_payload(
+                self._sketch_payload(), "sketches", KF_MAX_SERIES_PER_REQUEST, KF_MAX_PAYLOAD_BYTES
+            )
+            requests.extend((sketch_url, chunk) for chunk in sketch_chunks)
+        return requests
+
+    def checkpoint(self):
+        """Replaces the checkpoint with the data buffered so far, unless the
+        current one is younger than KF_BUFFER_CHECKPOINT_SECONDS. Best effort:
+        failures are logged and leave the previous checkpoint in place."""
+        if not checkpoint_buffer.enabled:
+            return
+        now = time.monotonic()
+        if (
+            self.checkpointed_at is not None
+            and now - self.checkpointed_at < KF_BUFFER_CHECKPOINT_SECONDS
+        ):
+            return
+        try:
+            with telemetry.timed("serialize"):
+                chunks = [
+                    (url,) + encode_payload(chunk.SerializeToString())
+                    for url, chunk in self._requests(get_kfuse_keys())
+                ]
+            if not checkpoint_buffer.replace(chunks):
+                raise OSError(f"could not write to {checkpoint_buffer.directory}")
+            self.checkpointed_at = now
+        except Exception as e:
+            logger.warning(f"Checkpointing {self.records} buffered records failed: {e}")
+
+
+# Size of the decompressed chunks the CloudWatch Logs payload is parsed in.
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def decompressed_text(compressed_chunks, chunk_size=DECODE_CHUNK_SIZE):
+    """Gunzips `compressed_chunks` incrementally and yields them as text in
+    chunks of at most `chunk_size` bytes, so the whole document is never in
+    memory."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for compressed in compressed_chunks:
+        while compressed:
+            out = decompressor.decompress(compressed, chunk_size)
+            compressed = decompressor.unconsumed_tail
+            if out:
+                yield decoder.decode(out)
+            if decompressor.eof:
+                # concatenated gzip members
+                compressed = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decoder.decode(decompressor.flush(), final=True)
+
+
+class JSONStream(object):
+    """Minimal pull parser over a JSON document that arrives in text chunks.
+
+    Values are decoded with json.JSONDecoder.raw_decode straight from the
+    buffer; only the unparsed tail of the buffer is kept between chunks.
+    """
+
+    WHITESPACE = " \t\n\r"
+    NUMBER_TAIL = "0123456789.eE+-"
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it,
+        or "" at the end of the document."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, characters):
+        char = self.peek()
+        if not char or char not in characters:
+            raise ValueError(
+                "Expected one of %r in JSON document, got %r" % (characters, char)
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk,
+            # also when only its leading part ("1" of "1.5" or "1e3") decoded.
+            if (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and all(c in self.NUMBER_TAIL for c in self.buf[end:])
+                and not self.eof
+                and self._fill()
+            ):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_log_events(data):
+    """Yields the logEvents of a base64 encoded, gzipped CloudWatch Logs
+    subscription payload one at a time, skipping all other fields."""
+    stream = JSONStream(decompressed_text([base64.b64decode(data)]))
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "logEvents":
+            stream.expect("[")
+            if stream.peek() != "]":
+                while True:
+                    yield stream.value()
+                    if stream.expect(",]") == "]":
+                        break
+            else:
+                stream.expect("]")
+        else:
+            stream.value()
+        if stream.expect(",}") == "}":
+            return
 
 
 stats = Stats()
+telemetry = Telemetry()
 
+# Lambda gives the runtime about 500 ms between SIGTERM and SIGKILL.
+SHUTDOWN_FLUSH_SECONDS = 0.3
 
-def lambda_handler(event, context):
-    # event is a dict containing a base64 string gzipped
-    with gzip.GzipFile(
-        fileobj=BytesIO(base64.b64decode(event["awslogs"]["data"]))
-    ) as decompress_stream:
-        data = b"".join(BufferedReader(decompress_stream))
 
-    event = json.loads(data)
-    function_arn = context.invoked_function_arn
-    # 'arn:aws:lambda:us-east-1:1234123412:function:VPCFlowLogs'
-    region, account = function_arn.split(":", 5)[3:5]
+def flush_on_shutdown(signum, frame):
+    """Flushes buffered data before the execution environment goes away.
+    Lambda only sends SIGTERM to the runtime when an extension is registered,
+    and kills it after the shutdown phase."""
+    if stats.records:
+        logger.info(f"Shutting down, flushing {stats.records} buffered records")
+        try:
+            stats.flush(deadline=time.monotonic() + SHUTDOWN_FLUSH_SECONDS)
+        except Exception as e:
+            logger.error(f"Flush on shutdown failed: {e}")
 
-    tags = ["region:%s" % region, "aws_account:%s" % account]
-    unsupported_messages = 0
 
-    node_ip = compute_node_ip(event["logEvents"])
+if KF_BUFFER_MAX_RECORDS > 0:
+    signal.signal(signal.SIGTERM, flush_on_shutdown)
+# A checkpoint left by an earlier runtime process holds buffered data whose
+# in-memory copy is gone; it is sent with the next flush.
+checkpoint_buffer.move_to(retry_buffer)
+logger.info(
+    "Lambda function initialized in %.1f ms, ready to send metrics"
+    % ((time.perf_counter() - _INIT_STARTED) * 1000)
+)
+
+
+# Object keys of flow logs delivered to S3:
+# AWSLogs/<account>/vpcflowlogs/<region>/<yyyy>/<mm>/<dd>/<file>
+S3_FLOWLOG_KEY = re.compile(r"AWSLogs/(?:[^/]+/)?(\d{12})/vpcflowlogs/([a-z0-9-]+)/")
+# Header lines only hold field names, e.g. "version account-id interface-id"
+FLOWLOG_HEADER = re.compile(r"^[a-z][a-z_-]*( [a-z][a-z_-]*)*$")
+S3_READ_SIZE = 1024 * 1024
 
-    for event in event["logEvents"]:
-        message = event["message"]
-        if message[0] != "3":
-            unsupported_messages += 1
-            continue
-        timestamp = event["timestamp"] / 1000
-        process_message(message, tags, timestamp, node_ip)
+
+def iter_lines(text_chunks):
+    tail = ""
+    for chunk in text_chunks:
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            if line:
+                yield line.rstrip("\r")
+    if tail:
+        yield tail.rstrip("\r")
+
+
+def _text(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def _parquet_lines(data):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet flow logs requires the pyarrow package")
+    # Rows are turned back into text lines so that they go through the same
+    # FlowLogFormat parsing as the text formats.
+    parquet_file = pq.ParquetFile(BytesIO(data))
+    yield " ".join(parquet_file.schema_arrow.names)
+    for record_batch in parquet_file.iter_batches(batch_size=KF_S3_CHUNK_RECORDS):
+        for row in zip(*(column.to_pylist() for column in record_batch.columns)):
+            yield " ".join("-" if value is None else str(value) for value in row)
+
+
+def flowlog_object_lines(name, chunks):
+    """Text lines of a flow log object given as an iterator of byte chunks:
+    plain text, gzip (detected by its magic bytes) or Parquet."""
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    chunks = itertools.chain([first], chunks)
+    if name.endswith(".parquet"):
+        # Parquet metadata sits at the end of the file, so it is read whole.
+        return _parquet_lines(b"".join(chunks))
+    if first[:2] == b"\x1f\x8b":
+        return iter_lines(decompressed_text(chunks))
+    return iter_lines(_text(chunks))
+
+
+def flowlog_objects(event):
+    """Yields (name, byte chunks) for every object of an S3 event notification,
+    or for every path of the local stand-in event {"flowlog_files": [...]}."""
+    for path in event.get("flowlog_files", []):
+        with open(path, "rb") as f:
+            yield path, iter(lambda: f.read(S3_READ_SIZE), b"")
+
+    records = [r for r in event.get("Records", []) if "s3" in r]
+    if records:
+        import boto3
+
+        s3 = boto3.client("s3")
+        for record in records:
+            bucket = record["s3"]["bucket"]["name"]
+            key = unquote_plus(record["s3"]["object"]["key"])
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+            try:
+                yield key, body.iter_chunks(S3_READ_SIZE)
+            finally:
+                body.close()
+
+
+def process_log_events(log_events, tags, flowlog_format=None, per_interface=False):
+    # log_events may be decoded lazily while they are parsed
+    with telemetry.timed("parse_aggregate", exclude=("decode", "node_ip")):
+        batch = parse_batch(log_events, flowlog_format, per_interface)
+        aggregate_batch(batch, tags)
+    telemetry.add("records", len(batch))
+    unsupported_messages = batch.unsupported
 
     if unsupported_messages:
         logger.info("Unsupported vpc flowlog message type, please contact Kloudfuse")
         stats.increment("unsupported_message", value=unsupported_messages, tags=tags)
+    return len(batch)
+
+
+def process_flowlog_object(name, chunks, tags, context):
+    match = S3_FLOWLOG_KEY.search(name)
+    if match:
+        account, region = match.groups()
+        tags = ["region:%s" % region, "aws_account:%s" % account]
+
+    lines = telemetry.timed_iter(flowlog_object_lines(name, chunks), "decode")
+    first = next(lines, None)
+    if first is None:
+        return 0
+    flowlog_format = FLOWLOG_FORMAT
+    if FLOWLOG_HEADER.match(first):
+        flowlog_format = FlowLogFormat.parse(first)
+    else:
+        lines = itertools.chain([first], lines)
+
+    records = 0
+    while True:
+        chunk = [
+            {"timestamp": None, "message": line}
+            for line in itertools.islice(lines, KF_S3_CHUNK_RECORDS)
+        ]
+        if not chunk:
+            break
+        records += process_log_events(chunk, tags, flowlog_format, per_interface=True)
+        stats.flush(context)
+    logger.info(f"Processed {records} flow log records from {name}")
+    return records
+
+
+def lambda_handler(event, context):
+    function_arn = context.invoked_function_arn
+    # 'arn:aws:lambda:us-east-1:1234123412:function:VPCFlowLogs'
+    region, account = function_arn.split(":", 5)[3:5]
+
+    tags = ["region:%s" % region, "aws_account:%s" % account]
+    telemetry.reset(tags)
+
+    try:
+        # Resolved before anything is aggregated: once a key is cached, a
+        # failed refresh falls back to it, so a flush cannot fail on the key
+        # after this invocation's records were added to stats.
+        get_kfuse_keys()
+
+        if "awslogs" not in event:
+            # S3 object notifications, or local files standing in for them
+            for name, chunks in flowlog_objects(event):
+                process_flowlog_object(name, chunks, tags, context)
+            return
 
-    stats.flush()
+        # event is a dict containing a base64 string gzipped; its log events
+        # are decoded incrementally while they are parsed
+        log_events = iter_log_events(event["awslogs"]["data"])
+        stats.buffer(process_log_events(telemetry.timed_iter(log_events, "decode"), tags))
+        if stats.flush_due():
+            stats.flush(context)
+        else:
+            stats.checkpoint()
+            logger.info(f"Buffered {stats.records} records for a later flush")
+    finally:
+        telemetry.log()